@@ -17,68 +17,209 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 
+import os
+
 from flask import (
     Flask,
     redirect,
     url_for,
 )
-
-import settings
-from auth_blueprint.auth_blueprint import auth_blueprint
-from doc_blueprint.doc_blueprint import doc_blueprint
-from extensions import csrf, db, login_manager
+from jinja2 import FileSystemBytecodeCache
+
+from engine_config import (
+    DEFAULT_ENGINE,
+    DEFAULT_SQLITE,
+    apply_sqlite_pragmas,
+    dispose_after_fork,
+    engine_options,
+)
+from extensions import csrf, db, init_query_budget, login_manager
+from filehandle import read_cached
+from hitokoto import load_hitokoto_file
+from jobs import init_job_worker, worker_command
 from models import User
-from point_and_timer_blueprint.point import point_blueprint
-from point_and_timer_blueprint.timer_submit import timer_submit_blueprint
-from reward_and_task_blueprint.reward_blueprint import reward_blueprint
-from reward_and_task_blueprint.task_blueprint import task_blueprint
-from system_blueprint.heartbeat import heartbeat_blueprint
-from system_blueprint.hitokoto import hitokoto_blueprint
-from system_blueprint.index import index_blueprint
-from system_blueprint.settings import settings_blueprint
-
-app = Flask(__name__)
+from priority_aging import age_priorities_command
+from schema import upgrade_schema
+from seed import seed_command
+from sharding import init_shards, rebalance_command, shard_binds, use_shard
+
+# 运行时不会改变的模板片段，预加载时在fork前读取
+PARTIALS = (
+    "partials/remove_text.html",
+    "partials/reward_text.html",
+    "partials/task_text.html",
+)
 
 
-app.register_blueprint(auth_blueprint)
-app.register_blueprint(doc_blueprint)
-app.register_blueprint(settings_blueprint)
-app.register_blueprint(index_blueprint)
-app.register_blueprint(hitokoto_blueprint)
-app.register_blueprint(heartbeat_blueprint)
-app.register_blueprint(point_blueprint)
-app.register_blueprint(timer_submit_blueprint)
-app.register_blueprint(reward_blueprint)
+def register_blueprints(app):
+    """
+    注册所有蓝图
+    蓝图模块在这里才导入，导入app模块本身不会加载任何蓝图
+    """
+    from auth_blueprint.auth_blueprint import auth_blueprint
+    from doc_blueprint.doc_blueprint import doc_blueprint
+    from export_and_import_blueprint.export import export_blueprint
+    from export_and_import_blueprint.import_data import import_blueprint
+    from point_and_timer_blueprint.point import point_blueprint
+    from point_and_timer_blueprint.timer_events import timer_events_blueprint
+    from point_and_timer_blueprint.timer_submit import timer_submit_blueprint
+    from reward_and_task_blueprint.reward_blueprint import reward_blueprint
+    from reward_and_task_blueprint.task_blueprint import task_blueprint
+    from system_blueprint.heartbeat import heartbeat_blueprint
+    from system_blueprint.hitokoto import hitokoto_blueprint
+    from system_blueprint.index import index_blueprint
+    from system_blueprint.leaderboard import leaderboard_blueprint
+    from system_blueprint.settings import settings_blueprint
+
+    app.register_blueprint(auth_blueprint)
+    app.register_blueprint(doc_blueprint)
+    app.register_blueprint(settings_blueprint)
+    app.register_blueprint(index_blueprint)
+    app.register_blueprint(hitokoto_blueprint)
+    app.register_blueprint(leaderboard_blueprint)
+    app.register_blueprint(heartbeat_blueprint)
+    app.register_blueprint(point_blueprint)
+    app.register_blueprint(timer_submit_blueprint)
+    app.register_blueprint(timer_events_blueprint)
+    app.register_blueprint(reward_blueprint)
+    app.register_blueprint(export_blueprint)
+    app.register_blueprint(import_blueprint)
+
+    app.register_blueprint(task_blueprint)
+
+
+def init_template_cache(app):
+    """
+    启用Jinja字节码缓存，TEMPLATE_CACHE为空时不启用
+    - 编译结果保存在文件中，新启动的worker直接加载，不必重新编译模板
+    - 缓存按模板源码的校验和区分，模板修改后会自动重新编译
+    - 相对路径以项目目录为基准
+    """
+    directory = app.config["TEMPLATE_CACHE"]
+    if not directory:
+        return
+    directory = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), directory
+    )
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
 
-app.register_blueprint(task_blueprint)
 
+def create_app(config=None):
+    """
+    应用工厂
+    - config为None时从settings.json读取配置（文件不存在时会生成并退出）
+    - 传入字典时直接使用，不读写settings.json，便于测试创建相互隔离的应用
+    - 诗词库和模板片段首次使用时才读取，也可以调用warm_up提前读取
+    - SHARD_COUNT大于0时为每个分片注册一个bind，用户数据按user_id分片存放
+    """
+    app = Flask(__name__)
+
+    app.config["PERMANENT_SESSION_LIFETIME"] = (
+        60 * 60 * 24 * 30
+    )  # 每30天强制自动登录
+    app.config["WTF_CSRF_TIME_LIMIT"] = 60 * 60 * 2  # 会话限制两小时
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["DEVELOPMENT"] = False
+    app.config["LOCAL_MODE"] = False
+    app.config["HITOKOTO_URL"] = "https://v1.hitokoto.cn/"
+    app.config["HITOKOTO_MAX_AGE"] = 60
+    app.config["TEMPLATE_CACHE"] = ""
+    app.config["JSON_COMPRESS_THRESHOLD"] = None
+    app.config["LEADERBOARD_SIZE"] = 20
+    app.config["LEADERBOARD_REFRESH"] = 60
+    app.config["JOB_WORKER_THREAD"] = True
+    app.config["SQLITE_SETTINGS"] = DEFAULT_SQLITE
+    app.config["ENGINE_SETTINGS"] = DEFAULT_ENGINE
+    app.config["SHARD_COUNT"] = 0
+
+    if config is None:
+        from settings import load_settings
+
+        config = load_settings()
+    app.config.update(config)
+    app.config.setdefault(
+        "SQLALCHEMY_ENGINE_OPTIONS",
+        engine_options(
+            app.config["SQLALCHEMY_DATABASE_URI"],
+            app.config["ENGINE_SETTINGS"],
+        ),
+    )
+    app.config.setdefault(
+        "SQLALCHEMY_BINDS",
+        shard_binds(
+            app.config["SQLALCHEMY_DATABASE_URI"],
+            app.config["SHARD_COUNT"],
+            app.config["ENGINE_SETTINGS"],
+        ),
+    )
+
+    init_template_cache(app)
+    register_blueprints(app)
+
+    # 初始化扩展
+    csrf.init_app(app)
+    login_manager.init_app(app)
+    db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_sqlite_pragmas(engine, app.config["SQLITE_SETTINGS"])
+            dispose_after_fork(engine)
+    init_query_budget(app)
+    init_job_worker(app)
+
+    app.cli.add_command(seed_command)
+    app.cli.add_command(age_priorities_command)
+    app.cli.add_command(worker_command)
+    app.cli.add_command(rebalance_command)
+
+    return app
+
+
+def warm_up(app=None):
+    """
+    提前读取诗词库和模板片段，传入app时同时编译所有已注册的模板
+    gunicorn使用--preload时在master进程中调用，fork出的worker通过写时复制共享
+    """
+    load_hitokoto_file()
+    for partial in PARTIALS:
+        read_cached(partial)
+    if app is not None:
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
 
-app.config["SQLALCHEMY_DATABASE_URI"] = settings.DATA
-app.config["SECRET_KEY"] = settings.KEY
-app.config["PERMANENT_SESSION_LIFETIME"] = (
-    60 * 60 * 24 * 30
-)  # 每30天强制自动登录
-app.config["WTF_CSRF_TIME_LIMIT"] = 60 * 60 * 2  # 会话限制两小时
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
-# 初始化扩展
-csrf.init_app(app)
-login_manager.init_app(app)
-db.init_app(app)
+def __getattr__(name):
+    # 兼容gunicorn app:app的启动方式，首次访问app属性时才创建应用
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # 初始化Flask-Migrate
 
 
 def init_db():
-    db.create_all()  # 创建所有表
+    # 只在主数据库创建表：分片的表由init_shards创建；同一进程中创建过
+    # 分片的应用后，db.create_all()会遍历所有出现过的bind，不分片的应用中会出错
+    db.create_all(bind_key=None)
+    changes = upgrade_schema(
+        db.engine, db.metadata
+    )  # 为已有的表补齐新增的列和索引
+    return changes + init_shards()  # 分片数据库中的用户数据表
 
 
 # 用户加载函数
 @login_manager.user_loader
 def load_user(user_id):
     # 根据实际情况实现用户查询逻辑
-    return User.query.get(int(user_id))
+    user = User.query.get(int(user_id))
+    if user is not None and not user.password:
+        return None  # 已注销、等待后台删除的账户
+    if user is not None:
+        use_shard(user)  # 之后访问用户数据时使用该用户所在的分片
+    return user
 
 
 @login_manager.unauthorized_handler
@@ -99,7 +240,8 @@ if __name__ == "__main__":
     - 监听所有网络接口（便于容器部署）
     - 使用  默认端口5000
     """
-    if settings.DEVELOPMENT == "True":
+    app = create_app()
+    if app.config["DEVELOPMENT"]:
         app.run(host="0.0.0.0", port=8080, debug=True)
     else:
         print("生产环境下不宜使用开发服务器启动，请使用gunicorn启动程序")
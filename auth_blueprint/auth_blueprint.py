@@ -2,19 +2,23 @@ import flask_login
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from werkzeug.security import check_password_hash, generate_password_hash
 
-from extensions import db, error_handler
-from models import User
+from extensions import InputError, db, error_handler, query_budget
+from jobs import enqueue, job
+from models import User, UserData
+from sharding import assign_shard, use_shard
 
 auth_blueprint = Blueprint("auth", __name__, template_folder="templates")
 
 
 @auth_blueprint.route("/login")
+@query_budget(1)
 @error_handler
 def login():
     return render_template("login.html")
 
 
 @auth_blueprint.route("/login_submit", methods=["POST"])
+@query_budget(1)
 @error_handler
 def login_submit():
     def wrapped_login_submit():
@@ -22,11 +26,11 @@ def login_submit():
         input_password = request.form.get("password")
 
         if not input_username or not input_password:
-            raise ValueError(info="用户名和密码不能为空")
+            raise InputError("用户名和密码不能为空")
 
         user = User.query.filter_by(username=input_username).first()
         if not user or not check_password_hash(user.password, input_password):
-            raise ValueError(info="用户名或密码错误")
+            raise InputError("用户名或密码错误")
 
         flask_login.login_user(user)
         return redirect(url_for("index_blueprint.index"))
@@ -35,26 +39,27 @@ def login_submit():
 
 
 @auth_blueprint.route("/register")
+@query_budget(1)
 @error_handler
 def register():
     return render_template("register.html")
 
 
 @auth_blueprint.route("/register_submit", methods=["POST"])
+@query_budget(4)
 @error_handler
 def register_submit():
-    from app import User, UserData
 
     def wrapped_register_submit():
         input_username = request.form.get("username")
         input_password = request.form.get("password")
 
         if not input_username or not input_password:
-            raise ValueError(info="用户名和密码不能为空")
+            raise InputError("用户名和密码不能为空")
         if len(input_password) < 6:
-            raise ValueError(info="密码长度至少为6位")
+            raise InputError("密码长度至少为6位")
         if User.query.filter_by(username=input_username).first():
-            raise ValueError(info="用户名已存在")
+            raise InputError("用户名已存在")
 
         user = User(
             username=input_username,
@@ -62,6 +67,7 @@ def register_submit():
         )
         db.session.add(user)
         db.session.flush()  # 获取生成的user.id
+        assign_shard(user)  # 按user.id选择用户数据所在的分片
 
         # 第二步：创建关联数据
         user_data = UserData()
@@ -81,6 +87,7 @@ def register_submit():
 
 
 @auth_blueprint.route("/logout")
+@query_budget(1)
 @error_handler
 def logout():
 
@@ -93,6 +100,7 @@ def logout():
 
 @auth_blueprint.route("/delete_account")
 @flask_login.login_required
+@query_budget(1)
 @error_handler
 def delete_account():
     """
@@ -103,17 +111,32 @@ def delete_account():
     return render_template("delete_account.html")
 
 
+@job("delete_account")
+def delete_account_job(user_id):
+    """
+    后台删除用户及其全部数据（级联删除）
+    用户已不存在时直接返回，重复执行不会出错
+    """
+    user = db.session.get(User, user_id)
+    if user is not None:
+        use_shard(user)  # 级联删除分片中的用户数据
+        db.session.delete(user)
+        db.session.commit()
+
+
 @auth_blueprint.route("/delete_account_submit", methods=["POST"])
 @flask_login.login_required
+@query_budget(5)
 @error_handler
 def delete_account_submit():
     """
     处理账户注销请求
     业务流程:
     1. 获取当前用户
-    2. 删除用户记录（级联删除关联数据）
-    3. 清除用户会话
-    4. 重定向到首页
+    2. 清空密码使账户无法再登录
+    3. 将删除用户记录（级联删除关联数据）的后台任务加入队列
+    4. 清除用户会话
+    5. 重定向到首页
 
     安全要求:
     - 必须登录才能访问
@@ -123,7 +146,12 @@ def delete_account_submit():
 
     def wrapped_delete_account_submit():
         user = flask_login.current_user
-        db.session.delete(user)
+        user.password = ""  # 无法通过check_password_hash校验
+        enqueue(
+            "delete_account",
+            {"user_id": user.id},
+            idempotency_key=f"delete_account:{user.id}",
+        )
         db.session.commit()
         flask_login.logout_user()
         flash("您的账户已成功注销")
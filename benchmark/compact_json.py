@@ -0,0 +1,115 @@
+"""
+任务字段编码对比测试
+对比旧版本db.JSON的文本、CompactJSON紧凑编码及其可选的zlib压缩：
+- 字节数、编码和解析耗时
+- 读取：从SQLite文件读取一行并解析的耗时（每个请求加载并使用任务的开销）
+- 仅加载：读取一行但不访问任务的耗时，CompactJSON返回LazyJSON，不解析
+
+用法：python benchmark/compact_json.py [任务数 ...]（默认1000和10000）
+"""
+
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compact_json import LazyJSON, decode, encode  # noqa: E402
+from seed import make_tasks  # noqa: E402
+
+
+def make_data(count):
+    """
+    生成与add_task_submit写入形状一致的任务，部分为定期任务
+    """
+    rng = random.Random(0)
+    task = make_tasks(rng, count)
+    for value in task.values():
+        if value["repeat"] and rng.random() < 0.5:
+            value["interval_hours"] = rng.choice([24, 168, 8])
+    return task
+
+
+def measure(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1000
+
+
+def measure_read(path, value, parse, number):
+    """
+    写入一行后每次新建连接读取并解析，模拟请求加载用户数据
+    """
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE user_data (id INTEGER PRIMARY KEY, task)")
+        conn.execute("INSERT INTO user_data VALUES (1, ?)", (value,))
+    conn.close()
+
+    def read():
+        conn = sqlite3.connect(path)
+        row = conn.execute(
+            "SELECT task FROM user_data WHERE id = 1"
+        ).fetchone()
+        conn.close()
+        return parse(row[0])
+
+    return measure(read, number)
+
+
+def main():
+    counts = [int(n) for n in sys.argv[1:]] or [1000, 10000]
+    print(
+        f"{'任务数':>6} {'编码':<8} {'字节数':>10} {'编码ms':>8} "
+        f"{'解析ms':>8} {'读取ms':>8} {'仅加载ms':>8}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for count in counts:
+            task = make_data(count)
+            number = max(1, 20000 // count)
+
+            def row(name, value, dump, parse, load):
+                path = os.path.join(directory, f"{name}{count}.db")
+                return (
+                    name,
+                    len(value),
+                    measure(dump, number),
+                    measure(lambda: parse(value), number),
+                    measure_read(path, value, parse, number),
+                    measure_read(path + "-load", value, load, number),
+                )
+
+            # 旧版本：db.JSON使用json.dumps的默认参数，读取时立即解析
+            old = json.dumps(task)
+            new = encode(task)
+            compressed = encode(task, compress_threshold=0)
+            for value in (new, compressed):
+                assert decode(value) == task
+            rows = [
+                row(
+                    "JSON",
+                    old,
+                    lambda: json.dumps(task),
+                    json.loads,
+                    json.loads,
+                ),
+                row("Compact", new, lambda: encode(task), decode, LazyJSON),
+                row(
+                    "zlib",
+                    compressed,
+                    lambda: encode(task, compress_threshold=0),
+                    decode,
+                    LazyJSON,
+                ),
+            ]
+
+            for name, size, encode_ms, decode_ms, read_ms, load_ms in rows:
+                print(
+                    f"{count:>6} {name:<8} {size:>10} {encode_ms:>8.2f} "
+                    f"{decode_ms:>8.2f} {read_ms:>8.2f} {load_ms:>8.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
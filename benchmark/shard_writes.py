@@ -0,0 +1,123 @@
+"""
+按用户分片的多进程写入吞吐量测试
+每个进程反复为不同用户修改积分（与/point相同的读取-修改-提交），
+对比不同分片数下每秒完成的写入次数和因锁等待超时失败的次数
+
+用法：python benchmark/shard_writes.py [进程数] [每个进程的写入次数] [分片数 ...]
+默认8个进程、每个进程300次写入、分片数0（不分片）、1、2、4、8
+环境变量SYNCHRONOUS可以覆盖PRAGMA synchronous，例如FULL时每次提交都等待落盘，
+写锁持有时间更长，更接近磁盘较慢的服务器
+环境变量LOCK_HOLD_MS在写入后、提交前等待指定的毫秒数，模拟落盘较慢时
+每次提交持有写锁的时间；等待不占用CPU，单核机器上也能看出写锁的竞争
+分片只能分散写锁，CPU核数少于进程数且写锁持有时间很短时，
+吞吐量受CPU限制，分片没有提升
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from app import create_app, init_db  # noqa: E402
+from engine_config import DEFAULT_SQLITE  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User  # noqa: E402
+from seed import seed_command  # noqa: E402
+from sharding import use_shard  # noqa: E402
+
+USERS = 400
+SYNCHRONOUS = os.environ.get("SYNCHRONOUS", DEFAULT_SQLITE["synchronous"])
+LOCK_HOLD = float(os.environ.get("LOCK_HOLD_MS", 0)) / 1000
+
+
+def make_config(path, shards):
+    return {
+        "SQLITE_SETTINGS": {**DEFAULT_SQLITE, "synchronous": SYNCHRONOUS},
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+        "SECRET_KEY": "benchmark",
+        "LOCAL_MODE": True,
+        "SHARD_COUNT": shards,
+    }
+
+
+def prepare(config):
+    app = create_app(config)
+    with app.app_context():
+        init_db()
+        result = app.test_cli_runner().invoke(
+            seed_command, ["--users", str(USERS), "--tasks", "20"]
+        )
+        assert result.exit_code == 0, result.output
+
+
+def worker(config, processes, writes, worker_id, start, results):
+    app = create_app(config)
+    start.wait()
+    locked = 0
+    for n in range(writes):
+        # 每个进程轮流修改属于自己的用户，用户均匀分布在各个分片中，
+        # 不同进程不会修改同一个用户，失败只来自数据库锁
+        user_id = (worker_id + n * processes) % USERS + 1
+        try:
+            with app.app_context():
+                user = db.session.get(User, user_id)
+                use_shard(user)
+                user.user_data.point += 1
+                if LOCK_HOLD:
+                    db.session.flush()  # UPDATE开始写事务，持有写锁直到提交
+                    time.sleep(LOCK_HOLD)
+                db.session.commit()
+        except OperationalError:
+            locked += 1
+        except Exception:
+            results.put(None)
+            raise
+    results.put(locked)
+
+
+def run(shards, processes, writes):
+    with tempfile.TemporaryDirectory() as directory:
+        config = make_config(os.path.join(directory, "data.db"), shards)
+        prepare(config)
+        results = multiprocessing.Queue()
+        start = multiprocessing.Event()
+        workers = [
+            multiprocessing.Process(
+                target=worker,
+                args=(config, processes, writes, i, start, results),
+            )
+            for i in range(processes)
+        ]
+        for p in workers:
+            p.start()
+        time.sleep(1)  # 等待所有进程完成导入和创建应用
+        started = time.perf_counter()
+        start.set()
+        counts = [results.get() for _ in workers]
+        assert None not in counts, "写入进程出错"
+        locked = sum(counts)
+        elapsed = time.perf_counter() - started
+        for p in workers:
+            p.join()
+    done = processes * writes - locked
+    return done / elapsed, locked
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    counts = [int(n) for n in sys.argv[3:]] or [0, 1, 2, 4, 8]
+    print(f"{processes} 个进程，每个进程 {writes} 次写入")
+    for shards in counts:
+        rate, locked = run(shards, processes, writes)
+        label = f"{shards} 个分片" if shards else "不分片"
+        print(f"{label:<8} {rate:>8.0f} 次/秒  锁等待失败 {locked} 次")
+
+
+if __name__ == "__main__":
+    main()
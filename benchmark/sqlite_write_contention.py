@@ -0,0 +1,98 @@
+"""
+多进程SQLite写入压力测试
+对比默认连接参数与settings.json中sqlite/engine配置的写入吞吐量和锁冲突次数
+
+用法：python benchmark/sqlite_write_contention.py [进程数] [每个进程的写入次数]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine_config import DEFAULT_SQLITE, apply_sqlite_pragmas  # noqa: E402
+
+ROWS = 1000
+
+
+def make_engine(path, tuned):
+    engine = create_engine(f"sqlite:///{path}")
+    if tuned:
+        apply_sqlite_pragmas(engine, DEFAULT_SQLITE)
+    return engine
+
+
+def prepare(path, tuned):
+    engine = make_engine(path, tuned)
+    with engine.begin() as conn:
+        conn.execute(
+            text("CREATE TABLE user_data (id INTEGER PRIMARY KEY, point INT)")
+        )
+        conn.execute(
+            text("INSERT INTO user_data (id, point) VALUES (:id, 0)"),
+            [{"id": i} for i in range(ROWS)],
+        )
+    engine.dispose()
+
+
+def worker(path, tuned, writes, worker_id, results):
+    engine = make_engine(path, tuned)
+    locked = 0
+    for n in range(writes):
+        try:
+            with engine.begin() as conn:
+                # 模拟一次积分变更：先读后写
+                row_id = (worker_id * writes + n) % ROWS
+                point = conn.execute(
+                    text("SELECT point FROM user_data WHERE id = :id"),
+                    {"id": row_id},
+                ).scalar()
+                conn.execute(
+                    text("UPDATE user_data SET point = :p WHERE id = :id"),
+                    {"p": point + 1, "id": row_id},
+                )
+        except OperationalError:
+            locked += 1
+    engine.dispose()
+    results.put(locked)
+
+
+def run(tuned, processes, writes):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        prepare(path, tuned)
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=worker, args=(path, tuned, writes, i, results)
+            )
+            for i in range(processes)
+        ]
+        started = time.perf_counter()
+        for p in workers:
+            p.start()
+        locked = sum(results.get() for _ in workers)
+        for p in workers:
+            p.join()
+        elapsed = time.perf_counter() - started
+
+    done = processes * writes - locked
+    name = "调优配置" if tuned else "默认配置"
+    print(
+        f"{name}: {done / elapsed:8.0f} 次写入/秒, "
+        f"锁冲突失败 {locked} 次, 用时 {elapsed:.2f} 秒"
+    )
+
+
+if __name__ == "__main__":
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    print(f"{processes} 个进程，每个进程写入 {writes} 次")
+    run(False, processes, writes)
+    run(True, processes, writes)
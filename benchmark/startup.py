@@ -0,0 +1,119 @@
+"""
+启动耗时与每个worker内存占用测试
+- 导入app模块、调用create_app各自的耗时
+- 模拟gunicorn：不预加载（每个worker自己创建应用）与预加载（fork前创建应用并warm_up）
+  两种方式下每个worker的RSS和私有内存（USS）
+
+用法：python benchmark/startup.py [worker数量]
+仅支持Linux（读取/proc/self/smaps_rollup）
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def memory_kb():
+    """
+    返回当前进程的(RSS, 私有内存)，单位KB
+    """
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Private_Clean:", "Private_Dirty:"):
+                values[parts[0]] = int(parts[1])
+    private = values["Private_Clean:"] + values["Private_Dirty:"]
+    return values["Rss:"], private
+
+
+def import_time():
+    code = (
+        "import time; t = time.perf_counter(); import app; "
+        "print(time.perf_counter() - t)"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT)
+    return float(output)
+
+
+def make_config(path):
+    return {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+        "SECRET_KEY": "benchmark",
+        "LOCAL_MODE": True,
+    }
+
+
+def serve_one_request(app):
+    client = app.test_client()
+    client.get("/login")
+    client.get("/about")
+
+
+def fork_workers(count, preloaded_app, config):
+    """
+    fork出count个worker，每个worker处理请求后报告内存占用
+    preloaded_app为None时由worker自己导入并创建应用
+    """
+    readers = []
+    for _ in range(count):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            app = preloaded_app
+            if app is None:
+                from app import create_app
+
+                app = create_app(config)
+            serve_one_request(app)
+            rss, private = memory_kb()
+            os.write(write_fd, f"{rss} {private}".encode())
+            os._exit(0)
+        os.close(write_fd)
+        readers.append((pid, read_fd))
+
+    results = []
+    for pid, read_fd in readers:
+        results.append(tuple(map(int, os.read(read_fd, 64).split())))
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+    return results
+
+
+def report(name, results):
+    rss = sum(r[0] for r in results) / len(results)
+    private = sum(r[1] for r in results) / len(results)
+    print(
+        f"{name}: 平均RSS {rss / 1024:.1f} MB, "
+        f"平均私有内存 {private / 1024:.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    print(f"导入app模块耗时: {import_time() * 1000:.0f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        config = make_config(os.path.join(directory, "bench.db"))
+
+        # 不预加载：父进程不导入应用
+        report("不预加载", fork_workers(workers, None, config))
+
+        from app import create_app, init_db, warm_up
+
+        started = time.perf_counter()
+        app = create_app(config)
+        print(
+            f"create_app耗时: {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        with app.app_context():
+            init_db()
+        warm_up()
+        serve_one_request(app)
+        report("预加载", fork_workers(workers, app, config))
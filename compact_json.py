@@ -0,0 +1,137 @@
+import json
+import zlib
+from collections.abc import Mapping
+
+from flask import current_app, has_app_context
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+# 数据头：第一个字节标记编码方式
+PLAIN = b"\x00"
+COMPRESSED = b"\x01"
+# 启用压缩时的压缩级别：级别1的体积比默认级别大约四分之一，但压缩速度快数倍
+COMPRESS_LEVEL = 1
+
+
+class CompactJSON(TypeDecorator):
+    """
+    紧凑编码的JSON字段，用于UserData.task和UserData.reward
+    - 以不含空格的JSON存储，加一个字节的数据头；中文仍转义为\\u，
+      纯ASCII的文本解析最快，不转义时体积小约6%，但编码更慢，解析也没有更快
+    - 读取时返回LazyJSON，第一次访问内容时才解析，
+      只用到积分等其他字段的请求不必解析整个任务JSON
+    - compress_threshold：编码后超过该字节数时用zlib压缩，
+      没有指定时使用应用配置JSON_COMPRESS_THRESHOLD（settings.json中的
+      json_compress_threshold），默认不压缩；压缩后体积约为七分之一，
+      但每次解析都要先解压，耗时增加约15%（见benchmark/compact_json.py）
+    - 兼容旧数据：db.JSON存储的文本读取时直接解析，下次写入时转换为当前编码
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, compress_threshold=None):
+        super().__init__()
+        self.compress_threshold = compress_threshold
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return encode(value, self.threshold())
+
+    def threshold(self):
+        if self.compress_threshold is not None:
+            return self.compress_threshold
+        if has_app_context():
+            return current_app.config.get("JSON_COMPRESS_THRESHOLD")
+        return None
+
+    def result_processor(self, dialect, coltype):
+        # 旧数据以文本存储，SQLite会返回str，不能交给LargeBinary转换为bytes
+        def process(value):
+            if value is None:
+                return None
+            return LazyJSON(value)
+
+        return process
+
+
+class LazyJSON(Mapping):
+    """
+    从数据库读取的JSON对象，第一次访问时才解码
+    - 只读，修改时和以前一样复制为dict后整体替换字段
+    - 常用的读取方法直接转发给解码后的dict
+    """
+
+    __slots__ = ("_raw", "_data")
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = decode(self._raw)
+            self._raw = None
+        return self._data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __eq__(self, other):
+        if isinstance(other, LazyJSON):
+            other = other.data
+        return self.data == other
+
+    def __repr__(self):
+        return f"LazyJSON({self.data!r})"
+
+    def keys(self):
+        return self.data.keys()
+
+    def values(self):
+        return self.data.values()
+
+    def items(self):
+        return self.data.items()
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+
+def encode(data, compress_threshold=None):
+    """
+    把字典编码为bytes
+    """
+    if isinstance(data, LazyJSON):
+        data = data.data
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    if compress_threshold is not None and len(raw) > compress_threshold:
+        return COMPRESSED + zlib.compress(raw, COMPRESS_LEVEL)
+    return PLAIN + raw
+
+
+def decode(value):
+    """
+    把encode的结果或旧数据解码为字典
+    """
+    if isinstance(value, str):
+        return json.loads(value)
+    value = bytes(value)
+    header, body = value[:1], value[1:]
+    if header == COMPRESSED:
+        body = zlib.decompress(body)
+    elif header != PLAIN:
+        body = value  # 以bytes返回的旧版本JSON文本
+    # 先解码为str再解析，比json.loads直接处理bytes快
+    return json.loads(body.decode())
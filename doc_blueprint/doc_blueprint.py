@@ -1,5 +1,6 @@
 from flask import Blueprint, Response, render_template
 
+from extensions import query_budget
 from filehandle import FileHandler
 
 doc_blueprint = Blueprint(
@@ -43,5 +44,6 @@ def licenses_not_software():
 
 
 @doc_blueprint.route("/about")
+@query_budget(1)
 def about():
     return render_template("about.html")
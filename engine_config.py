@@ -0,0 +1,96 @@
+import os
+import weakref
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# SQLite连接建立时执行的PRAGMA，可在settings.json的sqlite键中逐项覆盖
+DEFAULT_SQLITE = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -20000,
+    "mmap_size": 268435456,
+}
+
+# SQLAlchemy连接池参数，可在settings.json的engine键中逐项覆盖
+DEFAULT_ENGINE = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_pre_ping": True,
+    "pool_recycle": 3600,
+}
+
+# 只允许设置这些PRAGMA，避免配置文件中的任意内容被拼进SQL语句
+SQLITE_PRAGMAS = (
+    "journal_mode",
+    "synchronous",
+    "busy_timeout",
+    "cache_size",
+    "mmap_size",
+)
+
+
+def engine_options(uri, engine_settings):
+    """
+    根据数据库地址生成SQLALCHEMY_ENGINE_OPTIONS
+    - 内存SQLite使用单连接池，不支持pool_size等参数，直接跳过
+    """
+    url = make_url(uri)
+    in_memory = url.database in (None, "", ":memory:")
+    if url.get_backend_name() == "sqlite" and in_memory:
+        return {}
+    return dict(engine_settings)
+
+
+def sqlite_pragmas(sqlite_settings):
+    """
+    将sqlite配置转换为PRAGMA语句列表，未知的键会被忽略
+    """
+    return [
+        f"PRAGMA {name}={sqlite_settings[name]}"
+        for name in SQLITE_PRAGMAS
+        if name in sqlite_settings
+    ]
+
+
+def apply_sqlite_pragmas(engine, sqlite_settings):
+    """
+    在每个新建的SQLite连接上执行PRAGMA
+    - WAL模式下读写互不阻塞，多个gunicorn进程写入时不再频繁出现database is locked
+    - busy_timeout让写入方在锁被占用时等待，而不是立即报错
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    statements = sqlite_pragmas(sqlite_settings)
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+
+
+# 需要在fork后重置连接池的引擎，使用弱引用避免测试中反复创建应用时泄漏
+_forked_engines = weakref.WeakSet()
+_fork_hook_registered = False
+
+
+def _dispose_forked_engines():
+    # close=False：不关闭父进程的连接，只让子进程丢弃继承来的连接池
+    for engine in list(_forked_engines):
+        engine.dispose(close=False)
+
+
+def dispose_after_fork(engine):
+    """
+    在子进程中重置引擎的连接池
+    - gunicorn --preload在master中创建应用后fork出worker
+    - SQLite/数据库连接不能跨进程共享，worker必须使用自己的连接
+    """
+    global _fork_hook_registered
+    if not _fork_hook_registered and hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_dispose_forked_engines)
+        _fork_hook_registered = True
+    _forked_engines.add(engine)
@@ -0,0 +1,45 @@
+import json
+
+import flask_login
+from flask import Blueprint, Response, stream_with_context
+
+from extensions import error_handler, query_budget
+
+export_blueprint = Blueprint("export_blueprint", __name__)
+
+
+def export_records(point, reward, task):
+    """
+    逐条生成导出记录，每条记录为一行JSON（NDJSON）
+    - point: 当前积分余额
+    - reward: 每个奖励一条记录
+    - task: 每个任务一条记录
+    """
+    yield json.dumps({"type": "point", "point": point}) + "\n"
+    for name, points in reward.items():
+        record = {"type": "reward", "name": name, "points": points}
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+    for name, value in task.items():
+        record = {"type": "task", "name": name, **value}
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+@export_blueprint.route("/export")
+@flask_login.login_required
+@query_budget(2)
+@error_handler
+def export():
+    """
+    以NDJSON格式流式导出当前用户的积分、奖励和任务
+    - 数据在返回响应前读取，生成器只负责逐行序列化，不再访问数据库
+    - 响应逐行发送，不在内存中拼接完整的导出文件
+    """
+    user_data = flask_login.current_user.user_data
+    records = export_records(user_data.point, user_data.reward, user_data.task)
+    return Response(
+        stream_with_context(records),
+        mimetype="application/x-ndjson",
+        headers={
+            "Content-Disposition": "attachment; filename=reward_oneself.ndjson"
+        },
+    )
@@ -0,0 +1,172 @@
+import io
+import json
+from datetime import date
+
+import flask_login
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+
+from extensions import InputError, db, error_handler, query_budget
+from reward_and_task_blueprint.schedule import schedule_tasks
+from reward_and_task_blueprint.task_rules import check_task, compute_priority
+
+import_blueprint = Blueprint(
+    "import_blueprint", __name__, template_folder="templates"
+)
+
+# 每处理这么多条记录提交一次事务
+CHUNK_SIZE = 500
+
+
+def parse_task(record):
+    """
+    按add_task_submit的规则校验任务记录，返回(名称, 任务数据)
+    - 记录包含importance、value、urgent时，重新校验并计算优先级
+    - 否则视为本应用导出的记录，直接校验已有的优先级，
+      并保留老化用的初始优先级base_priority
+    - 保留创建日期created，没有时以今天为创建日期
+    """
+    name = record.get("name")
+    points = int(record.get("points"))
+    time = int(record.get("time", 0))
+    repeat = record.get("repeat") is True
+    base_priority = None
+
+    if "importance" in record:
+        importance = str(record.get("importance"))
+        value = int(record.get("value"))
+        urgent = int(record.get("urgent"))
+        if not check_task(name, points, time, importance, value, urgent):
+            raise InputError(f"任务 {name} 的参数不合法")
+        priority = compute_priority(importance, urgent, value, time)
+    else:
+        priority = record.get("priority")
+        if not (name and points > 0 and time >= 0):
+            raise InputError(f"任务 {name} 的参数不合法")
+        if priority != "max" and not isinstance(priority, int):
+            raise InputError(f"任务 {name} 的优先级不合法")
+        base_priority = record.get("base_priority")
+        if base_priority is not None and not isinstance(base_priority, int):
+            raise InputError(f"任务 {name} 的优先级不合法")
+
+    created = record.get("created", date.today().isoformat())
+    try:
+        date.fromisoformat(created)
+    except (TypeError, ValueError):
+        raise InputError(f"任务 {name} 的创建日期不合法")
+
+    data = {
+        "points": points,
+        "time": time,
+        "priority": priority,
+        "repeat": repeat,
+        "created": created,
+    }
+    if base_priority is not None:
+        data["base_priority"] = base_priority
+    interval_hours = int(record.get("interval_hours", 0))
+    if interval_hours < 0:
+        raise InputError(f"任务 {name} 的间隔小时数不合法")
+    if repeat and interval_hours:
+        data["interval_hours"] = interval_hours
+    return name, data
+
+
+def parse_reward(record):
+    name = record.get("name")
+    points = int(record.get("points"))
+    if not name or not points > 0:
+        raise InputError(f"奖励 {name} 的参数不合法")
+    return name, points
+
+
+def apply_chunk(user_data, point, reward, task):
+    """
+    将一批记录合并到用户数据并提交事务
+    同名的任务和奖励会被覆盖，导入的定期任务立即到期
+    """
+    if point is not None:
+        user_data.point = point
+    if reward:
+        user_data.reward = {**user_data.reward, **reward}
+    if task:
+        user_data.task = {**user_data.task, **task}
+        schedule_tasks(
+            user_data.user_id,
+            {
+                name: data.get("interval_hours", 0)
+                for name, data in task.items()
+            },
+        )
+    db.session.commit()
+
+
+@import_blueprint.route("/import")
+@flask_login.login_required
+@query_budget(1)
+def import_page():
+    """
+    渲染导入数据的页面
+    """
+    return render_template("import.html")
+
+
+@import_blueprint.route("/import_submit", methods=["POST"])
+@flask_login.login_required
+@query_budget(5)
+@error_handler
+def import_submit():
+    """
+    处理导入数据的提交请求
+    业务流程：
+    1. 逐行读取上传的NDJSON文件，不一次性读入整个文件
+    2. 按add_task_submit的规则校验每条记录
+    3. 每CHUNK_SIZE条记录合并并提交一次事务
+    4. 某行出错时停止导入并提示行号，之前已提交的批次保留
+    query_budget按一个批次计算，每多一个批次增加约3条语句
+    """
+    upload = request.files.get("file")
+    if not upload:
+        raise InputError("请选择要导入的文件")
+
+    user_data = flask_login.current_user.user_data
+    point, reward, task = None, {}, {}
+    count = 0
+    lines = io.TextIOWrapper(upload.stream, encoding="utf-8")
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            raise InputError(f"第{line_number}行格式错误")
+        if not isinstance(record, dict):
+            raise InputError(f"第{line_number}行格式错误")
+
+        # 字段缺失、为null或不是数字时int()抛出TypeError/ValueError
+        try:
+            record_type = record.get("type")
+            if record_type == "task":
+                name, data = parse_task(record)
+                task[name] = data
+            elif record_type == "reward":
+                name, points = parse_reward(record)
+                reward[name] = points
+            elif record_type == "point":
+                point = int(record.get("point"))
+                if point < 0:
+                    raise InputError("积分不能为负数")
+            else:
+                raise InputError("记录类型未知")
+        except InputError as e:
+            raise InputError(f"第{line_number}行：{e.info}")
+        except (TypeError, ValueError, OverflowError):
+            raise InputError(f"第{line_number}行的字段缺失或不是合法的数值")
+
+        count += 1
+        if count % CHUNK_SIZE == 0:
+            apply_chunk(user_data, point, reward, task)
+            point, reward, task = None, {}, {}
+
+    apply_chunk(user_data, point, reward, task)
+    flash(f"成功导入 {count} 条记录")
+    return redirect(url_for("index_blueprint.index"))
@@ -1,13 +1,64 @@
 import functools
+import random
+import time
 
-from flask import render_template
+from flask import (
+    current_app,
+    g,
+    has_request_context,
+    render_template,
+    request,
+)
 from flask_login import LoginManager
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_wtf.csrf import CSRFProtect
-from sqlalchemy.exc import DatabaseError
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DatabaseError, UnboundExecutionError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.sql.util import find_tables
+
+# 分片数据库在SQLALCHEMY_BINDS中的键，编号从0开始
+SHARD_BIND = "shard{}"
+
+
+class ShardSession(Session):
+    """
+    支持按用户分片的Session
+    - 表的info中sharded为True的表（用户数据）路由到session.info["shard"]
+      指定的分片数据库，None表示主数据库，由sharding.use_shard设置
+    - 其他表（用户目录、后台任务）始终使用主数据库
+    - 没有配置分片时与Flask-SQLAlchemy的默认行为一致
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engines = self._db.engines
+        if bind is None and SHARD_BIND.format(0) in engines:
+            tables = set()
+            if mapper is not None:
+                tables.update(inspect(mapper).tables)
+            if clause is not None:
+                tables.update(find_tables(clause, include_crud=True))
+            sharded = {table.info.get("sharded", False) for table in tables}
+            if sharded == {True, False}:
+                raise UnboundExecutionError(
+                    "分片表和主数据库的表不能在同一条语句中查询"
+                )
+            if sharded == {True}:
+                if "shard" not in self.info:
+                    raise UnboundExecutionError(
+                        "访问用户数据前需要调用sharding.use_shard指定分片"
+                    )
+                shard = self.info["shard"]
+                return engines[
+                    None if shard is None else SHARD_BIND.format(shard)
+                ]
+        return super().get_bind(mapper, clause, bind, **kwargs)
+
 
 # 初始化数据库
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": ShardSession})
 
 # 初始化CSRF保护
 csrf = CSRFProtect()
@@ -16,10 +67,21 @@ csrf = CSRFProtect()
 login_manager = LoginManager()
 
 
+class InputError(ValueError):
+    """
+    需要向用户显示提示的输入错误，info为提示内容，由error_handler显示
+    """
+
+    def __init__(self, info):
+        super().__init__(info)
+        self.info = info
+
+
 def error_handler(func):
     """
     错误处理装饰器，用于捕获并处理视图函数中的异常
     - 处理数据库错误
+    - 处理乐观锁版本冲突（其他请求同时修改了同一用户的数据）
     - 处理值错误
     - 处理其他未知错误
     """
@@ -33,6 +95,11 @@ def error_handler(func):
             error_info = "抱歉，系统与数据库交互时出现问题，请稍后再试。"
             print(f"Database error: {str(e)}")
             return render_template("error.html", type=error_info)
+        except StaleDataError as e:
+            db.session.rollback()
+            error_info = "数据已在其他页面被修改，请刷新后重试。"
+            print(f"Version conflict: {str(e)}")
+            return render_template("error.html", type=error_info)
         except ValueError as e:
             error_info = getattr(
                 e, "info", "输入的值格式不正确，请检查后重新操作。"
@@ -45,3 +112,94 @@ def error_handler(func):
             return render_template("error.html", type=error_info)
 
     return wrapper
+
+
+def commit_with_retry(apply, attempts=10):
+    """
+    乐观并发控制下的修改与提交
+    - apply负责读取当前数据并修改，每次重试都基于重新加载的最新数据，
+      相当于把本次修改合并到其他请求已提交的修改之上
+    - 版本冲突（StaleDataError）时回滚，随机等待后重试，等待上限逐次翻倍；
+      apply中的查询可能触发自动flush，冲突也会在apply中抛出
+    - 最后一次仍然冲突时抛出异常，由error_handler处理
+    - 返回最后一次apply的返回值
+    """
+    for attempt in range(attempts):
+        try:
+            result = apply()
+            db.session.commit()
+            return result
+        except StaleDataError:
+            db.session.rollback()  # 回滚会使已加载的数据过期，下次访问时重新读取
+            if attempt == attempts - 1:
+                raise
+            time.sleep(random.uniform(0, 0.002 * 2**attempt))
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    测试模式下，某个路由执行的SQL语句数量超过其声明的预算，
+    或没有声明预算却执行了SQL语句时抛出
+    - 错误信息中列出本次请求执行过的全部语句，便于在审查时发现N+1问题
+    """
+
+
+def query_budget(limit, per_shard=0):
+    """
+    声明路由在一次请求中允许执行的SQL语句数量上限
+    - 只做标记，实际检查由init_query_budget注册的钩子在测试模式下完成
+    - functools.wraps会复制函数属性，因此可以和error_handler等装饰器叠加
+    - per_shard：需要查询所有分片的路由，每个分片额外允许的语句数
+    """
+
+    def decorator(func):
+        func.query_budget = limit
+        func.query_budget_per_shard = per_shard
+        return func
+
+    return decorator
+
+
+def _record_statement(conn, cursor, statement, parameters, context, many):
+    # 只在测试模式的请求上下文中计数，生产环境不产生额外开销
+    if has_request_context() and current_app.testing:
+        g.setdefault("sql_statements", []).append(statement)
+
+
+def init_query_budget(app):
+    """
+    注册SQL语句预算检查
+    - 在所有Engine上监听before_cursor_execute，统计每个请求执行的语句
+    - 请求结束后对比视图函数声明的预算，超出时抛出QueryBudgetExceeded
+    - 没有声明预算的路由执行任何SQL语句都会抛出QueryBudgetExceeded，
+      因此每个访问数据库的路由（包括所有需要登录的路由）都必须声明预算
+    - 仅在app.testing为True时生效
+    """
+    if not event.contains(Engine, "before_cursor_execute", _record_statement):
+        event.listen(Engine, "before_cursor_execute", _record_statement)
+
+    @app.after_request
+    def check_query_budget(response):
+        if not app.testing:
+            return response
+        statements = g.get("sql_statements", [])
+        if not statements:
+            return response
+        view = app.view_functions.get(request.endpoint)
+        limit = getattr(view, "query_budget", None)
+        if limit is None:
+            problem = "但没有用query_budget声明预算"
+        else:
+            per_shard = getattr(view, "query_budget_per_shard", 0)
+            limit += per_shard * app.config.get("SHARD_COUNT", 0)
+            if len(statements) <= limit:
+                return response
+            problem = f"超出预算{limit}条"
+        report = "\n".join(
+            f"  {i}. {statement}"
+            for i, statement in enumerate(statements, start=1)
+        )
+        raise QueryBudgetExceeded(
+            f"{request.endpoint} 执行了{len(statements)}条SQL语句，"
+            f"{problem}：\n{report}"
+        )
@@ -1,3 +1,4 @@
+import functools
 import json
 import os
 
@@ -52,3 +53,12 @@ class FileHandler:
             return f"删除 {self.path} 成功"
         else:
             raise FileNotFoundError(f"文件 {self.path()} 不存在")
+
+
+@functools.cache
+def read_cached(file_name):
+    """
+    读取并缓存不会在运行时改变的文件（如partials模板片段）
+    同一进程内只读取一次，gunicorn预加载时可在fork前读取并由各worker共享
+    """
+    return FileHandler(file_name).read()
@@ -0,0 +1,20 @@
+# gunicorn配置：gunicorn -c gunicorn.conf.py -w 4 -b 0.0.0.0:8080 "app:create_app()"
+# master进程中创建应用，预读取诗词库和模板片段并编译所有模板，worker通过写时复制共享
+# 数据库连接池在fork后由engine_config.dispose_after_fork重置
+
+# 计时器事件流（/timer_stream）是长连接，gevent worker中每个连接只占用一个协程，
+# 不占用线程；其他worker中的计时器变更由事件流轮询数据库取得，可以运行多个worker
+# 预加载应用前先打补丁，使应用创建的锁和队列都是gevent版本
+from gevent import monkey
+
+monkey.patch_all()
+
+worker_class = "gevent"
+worker_connections = 1000
+preload_app = True
+
+
+def on_starting(server):
+    from app import warm_up
+
+    warm_up(server.app.wsgi())
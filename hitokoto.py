@@ -1,5 +1,6 @@
 # 该程序由通义灵码生成，用于获取一言（hitokoto）的数据
 
+import functools
 import json
 import random
 
@@ -7,13 +8,18 @@ import requests
 
 from filehandle import FileHandler
 
-file_handler = FileHandler("hitokoto.txt")
-hitokoto_text = file_handler.read()
-hitokoto_text = hitokoto_text.split("\n")
+
+@functools.cache
+def load_hitokoto_file():
+    """
+    读取本地诗词库，首次调用时才读取文件，之后复用同一个列表
+    """
+    file_handler = FileHandler("hitokoto.txt")
+    return file_handler.read().split("\n")
 
 
 def get_hitokoto_by_file():
-    return random.choice(hitokoto_text)
+    return random.choice(load_hitokoto_file())
 
 
 def get_hitokoto(HITOKOTO_URL=None, love="", LOCAL_MODE=False):
@@ -1,5 +1,6 @@
 import app
 
-with app.app.app_context():
-    app.init_db()
+with app.create_app().app_context():
+    for change in app.init_db():
+        print(f"已添加 {change}")
     print("数据库初始化成功")
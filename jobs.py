@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import or_, update
+
+from extensions import db
+from models import Job
+
+# 任务类型到处理函数的映射，由job装饰器注册
+JOBS = {}
+
+# 重试的退避时间：10秒、20秒、40秒……最长1小时
+BACKOFF_BASE = 10
+BACKOFF_MAX = 60 * 60
+# 执行超过这么多秒仍未完成的任务视为worker已退出，可被重新领取
+JOB_TIMEOUT = 10 * 60
+
+
+def job(name):
+    """
+    注册后台任务的处理函数
+    处理函数必须可以重复执行（幂等），失败重试或worker退出后会再次执行
+    """
+
+    def decorator(func):
+        JOBS[name] = func
+        return func
+
+    return decorator
+
+
+def enqueue(name, payload=None, idempotency_key=None, max_attempts=5):
+    """
+    将任务加入队列，不提交事务，由调用方与其他修改一起提交
+    - 相同idempotency_key的任务仍在等待或执行时不再重复入队，直接返回已有任务
+    - 已完成或失败的任务释放幂等键，之后可以用相同的键再次入队
+    """
+    if name not in JOBS:
+        raise KeyError(f"未注册的后台任务 {name}")
+    if idempotency_key is not None:
+        existing = Job.query.filter_by(idempotency_key=idempotency_key).first()
+        if existing is not None:
+            if existing.status in ("pending", "running"):
+                return existing
+            existing.idempotency_key = None
+    new_job = Job(
+        name=name,
+        payload=payload or {},
+        max_attempts=max_attempts,
+        run_at=datetime.now(),
+        idempotency_key=idempotency_key,
+    )
+    db.session.add(new_job)
+    return new_job
+
+
+def claim_job():
+    """
+    领取一个到期的任务
+    用带状态条件的UPDATE抢占，多个worker同时领取同一任务时只有一个成功
+    """
+    now = datetime.now()
+    claimable = or_(
+        (Job.status == "pending") & (Job.run_at <= now),
+        (Job.status == "running")
+        & (Job.locked_at < now - timedelta(seconds=JOB_TIMEOUT)),
+    )
+    candidate = db.session.scalar(
+        db.select(Job.id).where(claimable).order_by(Job.run_at).limit(1)
+    )
+    if candidate is None:
+        db.session.commit()
+        return None
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == candidate, claimable)
+        .values(status="running", locked_at=now, attempts=Job.attempts + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return None
+    return db.session.get(Job, candidate)
+
+
+def run_next():
+    """
+    领取并执行一个任务，没有可执行的任务时返回False
+    - 成功：标记为done
+    - 失败：未达到最多尝试次数时按指数退避重新排队，否则标记为failed
+    """
+    current = claim_job()
+    if current is None:
+        return False
+
+    handler = JOBS.get(current.name)
+    try:
+        if handler is None:
+            raise KeyError(f"未注册的后台任务 {current.name}")
+        handler(**current.payload)
+        current.status = "done"
+        current.last_error = None
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc()
+        print(f"Job error: {current.name}#{current.id}\n{error}")
+        current.last_error = error
+        if current.attempts >= current.max_attempts:
+            current.status = "failed"
+        else:
+            delay = min(
+                BACKOFF_BASE * 2 ** (current.attempts - 1), BACKOFF_MAX
+            )
+            current.status = "pending"
+            current.run_at = datetime.now() + timedelta(seconds=delay)
+        current.locked_at = None
+        db.session.commit()
+    return True
+
+
+def work(app, poll_interval=1.0, burst=False):
+    """
+    循环执行任务，队列为空时等待poll_interval秒
+    - burst为True时队列清空后立即返回
+    - 领取任务或记录失败时出错（例如数据库被锁定）只回滚并等待后重试，
+      不让worker退出；没有完成的任务超过JOB_TIMEOUT后会被重新领取
+    """
+    while True:
+        with app.app_context():
+            try:
+                ran = run_next()
+            except Exception:
+                db.session.rollback()
+                print(f"Job worker error:\n{traceback.format_exc()}")
+                time.sleep(poll_interval)
+                continue
+        if not ran:
+            if burst:
+                return
+            time.sleep(poll_interval)
+
+
+def init_job_worker(app):
+    """
+    JOB_WORKER_THREAD为True（默认）时，在每个进程处理第一个请求前启动后台worker线程
+    - 单独运行flask worker时可以关闭，web进程只负责入队
+    - 线程不能跨fork存活，所以不在create_app中启动，而是按进程号判断
+    - 多个进程各自运行worker时，claim_job保证同一任务只被执行一次
+    """
+    if not app.config["JOB_WORKER_THREAD"]:
+        return
+    state = {"pid": None}
+    lock = threading.Lock()
+
+    @app.before_request
+    def start_job_worker():
+        if state["pid"] == os.getpid():
+            return
+        with lock:
+            if state["pid"] != os.getpid():
+                state["pid"] = os.getpid()
+                threading.Thread(target=work, args=(app,), daemon=True).start()
+
+
+@click.command("worker")
+@click.option(
+    "--poll-interval",
+    default=1.0,
+    show_default=True,
+    help="队列为空时的等待秒数",
+)
+@click.option("--burst", is_flag=True, help="队列清空后退出")
+def worker_command(poll_interval, burst):
+    """
+    运行后台任务worker，可以同时运行多个
+    """
+    click.echo("后台任务worker已启动")
+    work(current_app._get_current_object(), poll_interval, burst)
@@ -1,15 +1,20 @@
+from datetime import datetime
+
 # 从extensions.py导入db实例
 from flask_login import UserMixin
 
+from compact_json import CompactJSON
 from extensions import db
 
 
 class User(db.Model, UserMixin):
     """
     用户模型，继承SQLAlchemy Model基类和Flask-Login UserMixin
-    - id: 主键，自增整数
+    - id: 主键，自增整数，使用AUTOINCREMENT，已删除用户的id不会分配给新用户，
+      后台任务的幂等键等按用户id生成的标识不会指向别的用户
     - username: 用户名，唯一且非空
     - password: 加密后的密码，长度128位
+    - shard: 用户数据所在的分片编号，为空表示在主数据库（见sharding.py）
     - get_id(): 返回字符串类型的用户ID（符合UserMixin要求）
     - user_data: 与UserData的一对一关系，级联删除
     """
@@ -17,6 +22,9 @@ class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
     password = db.Column(db.String(128), nullable=False)
+    shard = db.Column(db.Integer)
+
+    __table_args__ = {"sqlite_autoincrement": True}
 
     def get_id(self):
         return str(self.id)
@@ -27,11 +35,17 @@ class UserData(db.Model):
     用户数据模型，存储积分、任务和奖励信息
     - id: 主键，自增整数
     - user_id: 外键，关联User.id，级联删除
-    - reward: JSON字段，存储奖励信息，默认空对象
+    - reward: 紧凑编码的JSON字段，存储奖励信息，默认空对象
     - point: 积分余额，默认0
-    - task: JSON字段，存储任务信息，默认空对象
+    - task: 紧凑编码的JSON字段，存储任务信息，默认空对象
     - user: 反向关联User模型，配置级联删除
     - rest_time_to_work_ratio: 休息时间与工作时间的比例，默认5
+    - leaderboard: 是否参加积分排行榜，默认不参加
+    - version: 乐观锁版本号，每次更新自动加1，
+      提交时版本号已被其他请求修改会抛出StaleDataError
+    - (leaderboard, point)索引：排行榜取前K名和计算名次时只扫描索引
+    - 表的info中标记sharded：按用户分片时和TaskSchedule、TimerSession
+      一起存放在用户所在的分片数据库
     """
 
     id = db.Column(db.Integer, primary_key=True)
@@ -41,14 +55,132 @@ class UserData(db.Model):
         unique=True,
         nullable=False,
     )
-    reward = db.Column(db.JSON, nullable=False, default=lambda: {})
+    reward = db.Column(CompactJSON(), nullable=False, default=lambda: {})
     point = db.Column(db.Integer, nullable=False, default=0)
-    task = db.Column(db.JSON, nullable=False, default=lambda: {})
+    task = db.Column(CompactJSON(), nullable=False, default=lambda: {})
     love = db.Column(db.String(60), nullable=False, default="")
     rest_time_to_work_ratio = db.Column(db.Integer, nullable=False, default=5)
+    leaderboard = db.Column(
+        db.Boolean, nullable=False, default=False, server_default=db.false()
+    )
+    version = db.Column(db.Integer, nullable=False, server_default="1")
     user = db.relationship(
         "User",
         backref=db.backref(
             "user_data", uselist=False, cascade="all, delete-orphan"
         ),
     )
+
+    __table_args__ = (
+        db.Index("ix_user_data_leaderboard_point", "leaderboard", "point"),
+        {"info": {"sharded": True}},
+    )
+    __mapper_args__ = {"version_id_col": version}
+
+
+class TaskSchedule(db.Model):
+    """
+    定期重复任务的下次到期时间索引
+    - user_id: 外键，关联User.id，级联删除
+    - name: 任务名称，对应UserData.task中的键
+    - due_at: 下次到期时间，到期前任务不在主页显示
+    - (user_id, due_at)索引：查询到期/未到期任务时只扫描索引区间，
+      不必解析整个任务JSON
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("user.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    name = db.Column(db.String(255), nullable=False)
+    due_at = db.Column(db.DateTime, nullable=False)
+    user = db.relationship(
+        "User",
+        backref=db.backref("task_schedules", cascade="all, delete-orphan"),
+    )
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "name"),
+        db.Index("ix_task_schedule_user_due", "user_id", "due_at"),
+        {"info": {"sharded": True}},
+    )
+
+
+class Job(db.Model):
+    """
+    后台任务队列，保存在应用数据库中，不依赖外部消息队列
+    - name: 任务类型，对应jobs.JOBS中注册的处理函数
+    - payload: JSON参数，作为关键字参数传给处理函数
+    - status: pending/running/done/failed
+    - attempts/max_attempts: 已尝试次数和最多尝试次数
+    - run_at: 最早执行时间，失败重试时按指数退避推迟
+    - locked_at: 开始执行的时间，超时未完成的任务会被重新领取
+    - idempotency_key: 幂等键，相同的键在任务完成或失败前只会入队一次
+    - (status, run_at)索引：领取任务时只扫描到期的待执行任务
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=lambda: {})
+    status = db.Column(db.String(10), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    idempotency_key = db.Column(db.String(128), unique=True)
+
+    __table_args__ = (db.Index("ix_job_status_run_at", "status", "run_at"),)
+
+
+class TimerSession(db.Model):
+    """
+    用户当前计时器的服务端状态，每个用户最多一个
+    - name: 正在计时的任务名称
+    - work_seconds: 工作阶段的总秒数
+    - started_at: 开始时间
+    - paused_at: 暂停时间，未暂停时为空
+    - paused_seconds: 已累计的暂停秒数，不计入已用时间
+    - status: running/paused/finished
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("user.id", ondelete="CASCADE"),
+        unique=True,
+        nullable=False,
+    )
+    name = db.Column(db.String(255), nullable=False)
+    work_seconds = db.Column(db.Integer, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False)
+    paused_at = db.Column(db.DateTime)
+    paused_seconds = db.Column(db.Float, nullable=False, default=0)
+    status = db.Column(db.String(10), nullable=False, default="running")
+    user = db.relationship(
+        "User",
+        backref=db.backref(
+            "timer_session", uselist=False, cascade="all, delete-orphan"
+        ),
+    )
+
+    __table_args__ = {"info": {"sharded": True}}
+
+    def elapsed(self, now=None):
+        """
+        工作阶段已用秒数（不含暂停时间）
+        """
+        end = self.paused_at or now or datetime.now()
+        return (end - self.started_at).total_seconds() - self.paused_seconds
+
+    def to_dict(self):
+        elapsed = self.elapsed()
+        return {
+            "name": self.name,
+            "started": self.started_at.timestamp(),
+            "status": self.status,
+            "elapsed": int(elapsed),
+            "remaining": max(int(self.work_seconds - elapsed), 0),
+        }
@@ -1,8 +1,15 @@
 import flask_login
 from flask import Blueprint, render_template, request
 
-from extensions import db, error_handler
+from extensions import (
+    InputError,
+    commit_with_retry,
+    error_handler,
+    query_budget,
+)
+from reward_and_task_blueprint.schedule import reschedule_task
 
+from .timer_events import confirm_timer, publish_state
 from .timer_render import timer
 
 point_blueprint = Blueprint("point", __name__, template_folder="templates")
@@ -10,6 +17,7 @@ point_blueprint = Blueprint("point", __name__, template_folder="templates")
 
 @point_blueprint.route("/point", methods=["POST"])
 @flask_login.login_required
+@query_budget(8)
 @error_handler
 def point():
     user = flask_login.current_user
@@ -18,52 +26,72 @@ def point():
     repeat = request.form.get("repeat") == "True"
     from_page = request.form.get("from")
 
-    time = request.form.get("time")
-    if time:
-        time = int(time)
-
-    def process_point_change(type, repeat):
-        """处理积分变更，返回结果"""
+    def process_point_change(type, repeat, confirm=False):
+        """
+        处理积分变更，返回(结果, 是否删除了任务, 已确认的计时器)
+        积分、定期任务的到期时间、任务删除和计时器状态在同一个事务中提交，
+        版本冲突时基于最新数据重试
+        """
 
         if not point_change and name:
-            raise ValueError(info="参数错误")
+            raise InputError("参数错误")
+
+        def apply():
+            # 处理积分变更
+            updated_point = user.user_data.point + point_change
+            if updated_point < 0:
+                return ("失败，积分不足", False, None)
+
+            timer_session = None
+            if confirm:
+                # 服务端确认工作阶段的计时已完成，防止直接提交表单领取积分
+                timer_session = confirm_timer(user.id, name)
+                if timer_session is None:
+                    raise InputError("计时尚未完成，不能获得积分")
 
-        # 处理积分变更
-        updated_point = user.user_data.point + point_change
-        if updated_point < 0:
-            return ("失败，积分不足", False)
+            user.user_data.point = updated_point
 
-        user.user_data.point = updated_point
+            if type == "task" and repeat:
+                # 定期任务完成后顺延到下一个周期
+                interval_hours = user.user_data.task.get(name, {}).get(
+                    "interval_hours", 0
+                )
+                if interval_hours:
+                    reschedule_task(user.id, name, interval_hours)
 
-        db.session.commit()  # 提交积分更新
-        if type == "reward" or repeat:
-            return ("成功", False)
+            if type == "reward" or repeat:
+                return ("成功", False, timer_session)
 
-        try:
             task = dict(user.user_data.task)
+            if name not in task:
+                return ("成功。任务不存在", False, timer_session)
             del task[name]
             user.user_data.task = task
-            db.session.commit()
-            return ("成功。该任务已自动删除", True)
-        except KeyError:
-            return ("成功。任务不存在", False)
+            return ("成功。该任务已自动删除", True, timer_session)
+
+        return commit_with_retry(apply)
 
     if point_change < 0:
         # 如果积分变化为负数，则是奖励，跳过处理任务的逻辑
-        return_value = process_point_change(type="reward", repeat=repeat)
-        result = return_value[0]
+        result, _, _ = process_point_change(type="reward", repeat=repeat)
         return render_template(
             "point.html", result=result, name=name, point=user.user_data.point
         )
 
-    if time == 0:
-        result, delete = process_point_change(type="task", repeat=repeat)
+    # 是否需要计时以保存的任务时间为准，不使用表单中的time和from
+    time = user.user_data.task.get(name, {}).get("time", 0)
+    if not time:
+        result, _, _ = process_point_change(type="task", repeat=repeat)
         return render_template(
             "point.html", result=result, name=name, point=user.user_data.point
         )
 
     if from_page == "timer":
-        result, delete = process_point_change(type="task", repeat=repeat)
+        result, delete, timer_session = process_point_change(
+            type="task", repeat=repeat, confirm=True
+        )
+        if timer_session is not None:
+            publish_state(user.id, timer_session)
         if delete:
             return render_template(
                 "point.html",
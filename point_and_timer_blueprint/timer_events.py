@@ -0,0 +1,223 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+
+import flask_login
+from flask import Blueprint, Response, current_app, jsonify, request
+
+from extensions import InputError, db, error_handler, query_budget
+from models import TimerSession
+from sharding import shard_scope
+
+timer_events_blueprint = Blueprint("timer_events", __name__)
+
+# 每隔这么多秒查询一次数据库中的计时器状态，接收其他进程中的变更
+POLL_INTERVAL = 3
+# 没有事件时每隔这么多秒发送一次注释行，防止代理断开空闲连接
+KEEPALIVE = 15
+# 前端计时与服务端时间允许的误差（秒）
+TOLERANCE = 5
+
+
+class TimerHub:
+    """
+    进程内的计时器事件发布/订阅中心
+    - 每个订阅者只占用一个SimpleQueue，空闲连接不持有数据库连接
+    - 只在当前进程内广播，用于立即推送同一进程中的变更；
+      其他进程中的变更由事件流每POLL_INTERVAL秒查询数据库取得
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscriber = queue.SimpleQueue()
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+
+@timer_events_blueprint.record_once
+def init_hub(state):
+    state.app.extensions["timer_hub"] = TimerHub()
+
+
+def get_hub():
+    return current_app.extensions["timer_hub"]
+
+
+def format_event(state):
+    return f"data: {json.dumps(state, ensure_ascii=False)}\n\n"
+
+
+def session_event(session):
+    """
+    返回(状态标识, 事件)，状态标识只在开始、暂停、继续、完成时改变，
+    事件流据此判断查询到的状态是否已经推送过
+    """
+    if session is None:
+        return None, format_event(None)
+    key = (
+        session.name,
+        session.started_at,
+        session.paused_at,
+        session.paused_seconds,
+        session.status,
+    )
+    return key, format_event(session.to_dict())
+
+
+def confirm_timer(user_id, name):
+    """
+    确认用户的计时器已完成工作阶段，用于/point发放积分前校验
+    - 确认成功后标记为finished，同一次计时不能重复领取积分
+    - 不提交事务，由调用方与积分变更一起提交，提交后再调用publish_state
+    """
+    session = TimerSession.query.filter_by(user_id=user_id).first()
+    if session is None or session.name != name:
+        return None
+    if session.status == "finished":
+        return None
+    if session.elapsed() < session.work_seconds - TOLERANCE:
+        return None
+    if session.paused_at is not None:
+        session.paused_seconds += (
+            datetime.now() - session.paused_at
+        ).total_seconds()
+        session.paused_at = None
+    session.status = "finished"
+    return session
+
+
+def publish_state(user_id, session):
+    get_hub().publish(user_id, session_event(session))
+
+
+def poll_state(app, user_id, shard):
+    """
+    在新的应用上下文中查询计时器状态，查询后立即归还数据库连接
+    """
+    with app.app_context(), shard_scope(shard):
+        session = TimerSession.query.filter_by(user_id=user_id).first()
+        return session_event(session)
+
+
+def stream(app, user_id, shard, subscriber, initial):
+    """
+    SSE响应的生成器，先发送当前状态，之后推送状态变更
+    - 同一进程中的变更由TimerHub立即转发
+    - 每POLL_INTERVAL秒查询一次数据库，推送其他进程中的变更，
+      因此可以运行多个gunicorn worker
+    - 客户端断开时生成器被关闭，在finally中取消订阅
+    """
+    hub = app.extensions["timer_hub"]
+    try:
+        last_key, event = initial
+        yield event
+        last_sent = time.monotonic()
+        while True:
+            try:
+                key, event = subscriber.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                key, event = poll_state(app, user_id, shard)
+            if key != last_key:
+                last_key = key
+                last_sent = time.monotonic()
+                yield event
+            elif time.monotonic() - last_sent >= KEEPALIVE:
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+    finally:
+        hub.unsubscribe(user_id, subscriber)
+
+
+@timer_events_blueprint.route("/timer_stream")
+@flask_login.login_required
+@query_budget(2)
+def timer_stream():
+    """
+    计时器事件流（Server-Sent Events）
+    同一用户在任意页面或设备上开始、暂停、完成计时，都会推送到所有连接
+    """
+    user = flask_login.current_user
+    session = TimerSession.query.filter_by(user_id=user.id).first()
+    initial = session_event(session)
+    # 读取完初始状态后再订阅；生成器只在轮询时短暂使用数据库连接
+    subscriber = get_hub().subscribe(user.id)
+    return Response(
+        stream(
+            current_app._get_current_object(),
+            user.id,
+            user.shard,
+            subscriber,
+            initial,
+        ),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@timer_events_blueprint.route("/timer_event", methods=["POST"])
+@flask_login.login_required
+@query_budget(5)
+@error_handler
+def timer_event():
+    """
+    更新计时器状态并广播
+    - start: 开始新的计时，覆盖之前的计时；工作时长取自保存的任务，
+      不使用表单中的数据，/point据此校验计时是否完成
+    - pause/resume: 暂停或继续当前计时
+    """
+    user = flask_login.current_user
+    user_id = user.id
+    action = request.form.get("action")
+    name = request.form.get("name")
+    now = datetime.now()
+    session = TimerSession.query.filter_by(user_id=user_id).first()
+
+    if action == "start":
+        task = user.user_data.task.get(name)
+        if task is None:
+            raise InputError("任务不存在")
+        work_seconds = task.get("time", 0) * 60
+        if session is None:
+            session = TimerSession(user_id=user_id)
+            db.session.add(session)
+        session.name = name
+        session.work_seconds = work_seconds
+        session.started_at = now
+        session.paused_at = None
+        session.paused_seconds = 0
+        session.status = "running"
+    elif session is None or session.name != name:
+        raise InputError("计时器不存在")
+    elif action == "pause" and session.status == "running":
+        session.paused_at = now
+        session.status = "paused"
+    elif action == "resume" and session.status == "paused":
+        session.paused_seconds += (now - session.paused_at).total_seconds()
+        session.paused_at = None
+        session.status = "running"
+    elif action not in ("pause", "resume"):
+        raise InputError("参数错误")
+
+    db.session.commit()
+    publish_state(user_id, session)
+    return jsonify(session.to_dict())
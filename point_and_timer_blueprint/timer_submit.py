@@ -1,6 +1,8 @@
 import flask_login
 from flask import Blueprint, request
 
+from extensions import query_budget
+
 from .timer_render import timer
 
 timer_submit_blueprint = Blueprint(
@@ -10,9 +12,11 @@ timer_submit_blueprint = Blueprint(
 
 @timer_submit_blueprint.route("/timer_submit", methods=["POST"])
 @flask_login.login_required
+@query_budget(2)
 def timer_submit():
-    time = request.form.get("time")
     name = request.form.get("name")
+    # 与/timer_event和/point一致，计时时长取自保存的任务
+    time = flask_login.current_user.user_data.task.get(name, {}).get("time", 0)
     value = request.form.get("value")
     repeat = request.form.get("repeat")
 
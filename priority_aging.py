@@ -0,0 +1,125 @@
+import time as time_module
+from datetime import date
+
+import click
+from sqlalchemy import bindparam, select, update
+
+from extensions import db
+from models import UserData
+from sharding import shard_locations, shard_scope
+
+user_data_table = UserData.__table__
+
+
+def age_tasks(task, today, days_per_point):
+    """
+    计算老化后的任务优先级，返回新的任务字典，没有变化时返回None
+    - 优先级 = 创建时的优先级 + 已存在天数 ÷ days_per_point（向下取整）
+    - 优先级为max的任务不参与老化
+    - 没有创建日期的旧任务以今天为创建日期，当前优先级为初始优先级
+    """
+    aged = {}
+    changed = False
+    for name, value in task.items():
+        if value.get("priority") == "max":
+            aged[name] = value
+            continue
+        base = value.get("base_priority", value["priority"])
+        created = value.get("created", today.isoformat())
+        days = (today - date.fromisoformat(created)).days
+        priority = base + max(days, 0) // days_per_point
+        new_value = {
+            **value,
+            "priority": priority,
+            "base_priority": base,
+            "created": created,
+        }
+        changed = changed or new_value != value
+        aged[name] = new_value
+    return aged if changed else None
+
+
+def age_location(statement, today, days_per_point, batch_size):
+    """
+    处理当前分片中的所有行，返回(读取行数, 更新行数)
+    """
+    last_id = 0
+    scanned = updated = 0
+    while True:
+        rows = db.session.execute(
+            select(
+                user_data_table.c.id,
+                user_data_table.c.task,
+                user_data_table.c.version,
+            )
+            .where(user_data_table.c.id > last_id)
+            .order_by(user_data_table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        changes = []
+        for row_id, task, version in rows:
+            new_task = age_tasks(task, today, days_per_point)
+            if new_task is not None:
+                changes.append(
+                    {
+                        "row_id": row_id,
+                        "old_version": version,
+                        "new_task": new_task,
+                    }
+                )
+        if changes:
+            updated += db.session.execute(statement, changes).rowcount
+        db.session.commit()
+        scanned += len(rows)
+    return scanned, updated
+
+
+@click.command("age-priorities")
+@click.option(
+    "--batch-size", default=1000, show_default=True, help="每批处理的行数"
+)
+@click.option(
+    "--days-per-point",
+    default=7,
+    show_default=True,
+    help="任务每存在多少天优先级加1",
+)
+def age_priorities_command(batch_size, days_per_point):
+    """
+    按任务存在时间重新计算所有用户的任务优先级
+    - 按主键分批读取，每批一个短事务，避免长时间占用数据库锁影响网页请求
+    - 只写回有变化的行；写回时比较读取时的版本号，
+      期间被网页请求修改过的行会跳过，留到下次运行处理
+    - 写回时版本号加1，正在修改同一行的网页请求会检测到冲突并重试
+    - 按用户分片时依次处理主数据库和每个分片
+    """
+    today = date.today()
+    statement = (
+        update(user_data_table)
+        .where(
+            user_data_table.c.id == bindparam("row_id"),
+            user_data_table.c.version == bindparam("old_version"),
+        )
+        .values(
+            task=bindparam("new_task"),
+            version=user_data_table.c.version + 1,
+        )
+    )
+
+    started = time_module.perf_counter()
+    scanned = updated = 0
+    for shard in shard_locations():
+        with shard_scope(shard):
+            counts = age_location(statement, today, days_per_point, batch_size)
+        scanned += counts[0]
+        updated += counts[1]
+
+    elapsed = time_module.perf_counter() - started
+    click.echo(
+        f"处理 {scanned} 行，更新 {updated} 行，用时 {elapsed:.1f} 秒，"
+        f"{scanned / max(elapsed, 1e-9):.0f} 行/秒"
+    )
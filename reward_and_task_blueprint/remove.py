@@ -1,8 +1,10 @@
 import flask_login
 from flask import redirect, render_template, url_for
 
-from extensions import db, error_handler
-from filehandle import FileHandler
+from extensions import commit_with_retry, error_handler
+from filehandle import read_cached
+
+from .schedule import unschedule_tasks
 
 
 @error_handler
@@ -19,8 +21,7 @@ def remove(type_name):
         items = user.user_data.task
 
     text = ""
-    file_handler = FileHandler("partials/remove_text.html")
-    add_text = file_handler.read()
+    add_text = read_cached("partials/remove_text.html")
     for name in items.keys():
         text += add_text.format(name=name)
     return render_template("remove.html", type=type_name, text=text)
@@ -34,7 +35,7 @@ def remove_submit(type_name, form_data) -> str:
     1. 验证类型参数有效性
     2. 创建对应数据的副本并删除指定项
     3. 完全替换原有JSON字段触发数据库更新
-    4. 提交事务或在出错时回滚
+    4. 提交事务，版本冲突时基于最新数据重试
 
     安全要求：
     - 必须登录才能访问
@@ -56,13 +57,17 @@ def remove_submit(type_name, form_data) -> str:
 
         return updated_data
 
-    if type_name == "reward":
-        data = user.user_data.reward
-        user.user_data.reward = instead_data(data)
-    else:
-        data = user.user_data.task
-        user.user_data.task = instead_data(data)
+    def remove_items():
+        if type_name == "reward":
+            data = user.user_data.reward
+            user.user_data.reward = instead_data(data)
+        else:
+            data = user.user_data.task
+            user.user_data.task = instead_data(data)
+            unschedule_tasks(
+                user.id, [name for name in data if name in form_data]
+            )
 
-    db.session.commit()  # 提交数据库事务
+    commit_with_retry(remove_items)
 
     return redirect(url_for("index_blueprint.index"))
@@ -1,7 +1,12 @@
 import flask_login
 from flask import Blueprint, redirect, render_template, request, url_for
 
-from extensions import db, error_handler
+from extensions import (
+    InputError,
+    commit_with_retry,
+    error_handler,
+    query_budget,
+)
 
 from . import remove as remove_model  # 使用相对导入当前目录的模块
 
@@ -15,6 +20,7 @@ reward_blueprint = Blueprint(
 
 @reward_blueprint.route("/add")
 @flask_login.login_required
+@query_budget(1)
 def add_reward():
     """
     渲染添加新奖励的页面
@@ -24,6 +30,7 @@ def add_reward():
 
 @reward_blueprint.route("/add_submit", methods=["POST"])
 @flask_login.login_required
+@query_budget(3)
 @error_handler
 def add_reward_submit():
     """
@@ -32,31 +39,35 @@ def add_reward_submit():
     1. 验证参数有效性（名称、积分值）
     2. 创建奖励数据副本并更新
     3. 完全替换原有JSON字段触发数据库更新
-    4. 提交事务或在出错时回滚
+    4. 提交事务，版本冲突时基于最新数据重试
     """
     name = request.form.get("name")
     points = int(request.form.get("points"))
 
     if not points > 0:
-        raise ValueError(info="积分值必须为正整数")
+        raise InputError("积分值必须为正整数")
 
     user = flask_login.current_user
-    # 创建当前奖励数据的副本并完全替换原有字段
-    reward = dict(user.user_data.reward)  # 创建新对象确保SQLAlchemy检测到变化
-    reward[name] = points
-    user.user_data.reward = reward  # 完全替换字典触发数据库更新
 
-    db.session.commit()  # 提交数据库事务
+    def add_reward():
+        # 创建当前奖励数据的副本并完全替换原有字段
+        reward = dict(user.user_data.reward)  # 创建新对象确保检测到变化
+        reward[name] = points
+        user.user_data.reward = reward  # 完全替换字典触发数据库更新
+
+    commit_with_retry(add_reward)
     return redirect(url_for("index_blueprint.index"))
 
 
 @reward_blueprint.route("/remove")
 @flask_login.login_required
+@query_budget(2)
 def remove():
     return remove_model.remove("reward")
 
 
 @reward_blueprint.route("/remove_submit", methods=["POST"])
 @flask_login.login_required
+@query_budget(3)
 def remove_submit():
     return remove_model.remove_submit("reward", request.form.to_dict())
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects.sqlite import insert
+
+from extensions import db
+from models import TaskSchedule
+
+
+def schedule_tasks(user_id, intervals, due_at=None):
+    """
+    批量设置定期任务的下次到期时间，不存在时新建
+    - intervals: {任务名称: 间隔小时数}，为0的任务删除对应记录
+    - due_at默认为当前时间，即新添加的任务立即到期
+    - 利用(user_id, name)唯一约束以一条INSERT ... ON CONFLICT写入，
+      不必先查询已有记录
+    """
+    due_at = due_at or datetime.now()
+    unschedule_tasks(
+        user_id, [name for name, hours in intervals.items() if not hours]
+    )
+    rows = [
+        {"user_id": user_id, "name": name, "due_at": due_at}
+        for name, hours in intervals.items()
+        if hours
+    ]
+    if not rows:
+        return
+    statement = insert(TaskSchedule.__table__)
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=["user_id", "name"],
+            set_={"due_at": statement.excluded.due_at},
+        ),
+        rows,
+    )
+
+
+def schedule_task(user_id, name, interval_hours, due_at=None):
+    schedule_tasks(user_id, {name: interval_hours}, due_at)
+
+
+def reschedule_task(user_id, name, interval_hours):
+    """
+    完成定期任务后，从完成时间起顺延一个周期
+    """
+    due_at = datetime.now() + timedelta(hours=interval_hours)
+    schedule_task(user_id, name, interval_hours, due_at)
+
+
+def unschedule_tasks(user_id, names):
+    if not names:
+        return
+    TaskSchedule.query.filter(
+        TaskSchedule.user_id == user_id, TaskSchedule.name.in_(list(names))
+    ).delete(synchronize_session=False)
+
+
+def upcoming_tasks(user_id, now=None):
+    """
+    按到期时间升序返回尚未到期的任务[(名称, 到期时间)]
+    通过(user_id, due_at)索引只扫描未到期的区间
+    """
+    now = now or datetime.now()
+    rows = db.session.execute(
+        db.select(TaskSchedule.name, TaskSchedule.due_at)
+        .where(TaskSchedule.user_id == user_id, TaskSchedule.due_at > now)
+        .order_by(TaskSchedule.due_at)
+    )
+    return [tuple(row) for row in rows]
@@ -1,9 +1,13 @@
+from datetime import date
+
 import flask_login
 from flask import Blueprint, redirect, render_template, request, url_for
 
-from extensions import db, error_handler
+from extensions import commit_with_retry, error_handler, query_budget
 
 from . import remove as remove_model
+from .schedule import schedule_task
+from .task_rules import check_task, compute_priority, recurrence_hours
 
 task_blueprint = Blueprint(
     "task_blueprint", __name__, template_folder="templates", url_prefix="/task"
@@ -12,6 +16,7 @@ task_blueprint = Blueprint(
 
 @task_blueprint.route("/add")
 @flask_login.login_required
+@query_budget(1)
 def add_task():
     """
     渲染添加新任务的页面
@@ -21,6 +26,7 @@ def add_task():
 
 @task_blueprint.route("/add_submit", methods=["POST"])
 @flask_login.login_required
+@query_budget(4)
 @error_handler
 def add_task_submit():
     """
@@ -29,7 +35,9 @@ def add_task_submit():
     1. 验证参数有效性（名称、积分值、时间、重要性等）
     2. 创建任务数据副本并更新
     3. 完全替换原有JSON字段触发数据库更新
-    4. 提交事务或在出错时回滚
+    4. 定期任务写入到期时间索引，新任务立即到期；
+       不定期任务只在覆盖了同名定期任务时删除索引记录
+    5. 提交事务，版本冲突时基于最新数据重试
     """
     name = request.form.get("name")
     points = int(request.form.get("points"))
@@ -38,58 +46,51 @@ def add_task_submit():
     value = int(request.form.get("value"))
     urgent = int(request.form.get("urgent"))
     repeat = request.form.get("repeat") == "True"
-
-    def check():
-        return (
-            name
-            and name != ""
-            and points > 0
-            and time >= 0
-            and value > 0
-            and value <= 3
-            and urgent > 0
-            and urgent <= 3
-            and importance in ["0", "3", "4", "max"]
+    interval_hours = 0
+    if repeat:
+        interval_hours = recurrence_hours(
+            request.form.get("recurrence", ""),
+            request.form.get("interval_hours"),
         )
 
-    if not check():
+    if not check_task(name, points, time, importance, value, urgent):
         raise ValueError()
 
     user = flask_login.current_user
-    # 创建当前任务数据的副本并完全替换原有字段
-    task = dict(user.user_data.task)  # 创建新对象确保SQLAlchemy检测到变化
     # 构建任务对象
-
-    if importance == "max":
-        priority = "max"
-    else:
-        if time == 0:
-            priority = round(int(importance) * 4 + urgent * 2 + value * 3)
-        else:
-            priority = round(
-                int(importance) * 4 + urgent * 2 + value * 3 - time / 10
-            )
-
-    task[name] = {
+    priority = compute_priority(importance, urgent, value, time)
+    new_task = {
         "points": points,
         "time": time,
         "priority": priority,
         "repeat": repeat,
+        "created": date.today().isoformat(),
     }
-
-    user.user_data.task = task  # 完全替换字典触发数据库更新
-
-    db.session.commit()  # 提交数据库事务
+    if interval_hours:
+        new_task["interval_hours"] = interval_hours
+
+    def add_task():
+        # 创建当前任务数据的副本并完全替换原有字段
+        task = dict(user.user_data.task)  # 创建新对象确保检测到变化
+        previous = task.get(name, {})
+        task[name] = new_task
+        user.user_data.task = task  # 完全替换字典触发数据库更新
+        if interval_hours or previous.get("interval_hours"):
+            schedule_task(user.id, name, interval_hours)
+
+    commit_with_retry(add_task)
     return redirect(url_for("index_blueprint.index"))
 
 
 @task_blueprint.route("/remove")
 @flask_login.login_required
+@query_budget(2)
 def remove_task():
     return remove_model.remove("task")
 
 
 @task_blueprint.route("/remove_submit", methods=["POST"])
 @flask_login.login_required
+@query_budget(4)
 def remove_task_submit():
     return remove_model.remove_submit("task", request.form.to_dict())
@@ -0,0 +1,53 @@
+from extensions import InputError
+
+IMPORTANCE_CHOICES = ["0", "3", "4", "max"]
+
+
+def check_task(name, points, time, importance, value, urgent):
+    """
+    校验任务参数是否合法
+    - 名称非空，积分为正整数，时间不为负
+    - 价值、紧急度取值1-3，重要性只能是IMPORTANCE_CHOICES中的值
+    """
+    return bool(
+        name
+        and name != ""
+        and points > 0
+        and time >= 0
+        and value > 0
+        and value <= 3
+        and urgent > 0
+        and urgent <= 3
+        and importance in IMPORTANCE_CHOICES
+    )
+
+
+def compute_priority(importance, urgent, value, time):
+    """
+    计算任务优先级
+    优先级 = 重要性 × 4 + 紧急度 × 2 + 价值 × 3 - 时间 ÷ 10
+    重要性为max时优先级为"max"（无穷大）
+    """
+    if importance == "max":
+        return "max"
+    if time == 0:
+        return round(int(importance) * 4 + urgent * 2 + value * 3)
+    return round(int(importance) * 4 + urgent * 2 + value * 3 - time / 10)
+
+
+# 重复周期对应的小时数，"hours"表示自定义间隔
+RECURRENCE_HOURS = {"": 0, "daily": 24, "weekly": 24 * 7}
+
+
+def recurrence_hours(recurrence, interval_hours=None):
+    """
+    将表单中的重复周期转换为间隔小时数，0表示不定期（随时可做）
+    """
+    if recurrence == "hours":
+        hours = int(interval_hours)
+        if hours <= 0:
+            raise InputError("间隔小时数必须为正整数")
+        return hours
+    if recurrence not in RECURRENCE_HOURS:
+        raise InputError("重复周期不合法")
+    return RECURRENCE_HOURS[recurrence]
@@ -0,0 +1,32 @@
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+
+
+def upgrade_schema(engine, metadata):
+    """
+    为已有数据库补齐新增的列和索引
+    - db.create_all只会创建缺少的表，不会修改已存在的表
+    - 新增的列必须可为空或带有server_default，才能直接ALTER TABLE添加
+    - 返回执行过的变更，便于init.py输出
+    """
+    inspector = inspect(engine)
+    changes = []
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ADD COLUMN {ddl}"
+                )
+                changes.append(f"{table.name}.{column.name}")
+            indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+                    changes.append(index.name)
+    return changes
@@ -0,0 +1,128 @@
+import random
+import time as time_module
+from datetime import date, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import func, insert
+from werkzeug.security import generate_password_hash
+
+from extensions import db
+from models import User, UserData
+from reward_and_task_blueprint.task_rules import (
+    IMPORTANCE_CHOICES,
+    compute_priority,
+)
+from sharding import shard_for, shard_scope
+
+# 任务时间（分钟）及其权重，0表示不需要计时的任务
+TIME_CHOICES = [0, 5, 10, 15, 25, 30, 45, 60, 90, 120]
+TIME_WEIGHTS = [40, 5, 8, 10, 12, 8, 6, 6, 3, 2]
+IMPORTANCE_WEIGHTS = [30, 40, 25, 5]
+# 任务创建日期最多在多少天以前，老化任务按创建日期计算优先级
+MAX_AGE_DAYS = 365
+
+
+def make_tasks(rng, count, today=None):
+    """
+    生成count个任务，字段形状与add_task_submit写入的一致
+    创建日期在today之前MAX_AGE_DAYS天以内，today默认为当天
+    """
+    today = today or date.today()
+    task = {}
+    for n in range(count):
+        time = rng.choices(TIME_CHOICES, TIME_WEIGHTS)[0]
+        importance = rng.choices(IMPORTANCE_CHOICES, IMPORTANCE_WEIGHTS)[0]
+        value = rng.randint(1, 3)
+        urgent = rng.randint(1, 3)
+        task[f"任务{n}"] = {
+            "points": rng.randint(1, 20),
+            "time": time,
+            "priority": compute_priority(importance, urgent, value, time),
+            "repeat": rng.random() < 0.3,
+            "created": (
+                today - timedelta(days=rng.randint(0, MAX_AGE_DAYS))
+            ).isoformat(),
+        }
+    return task
+
+
+def make_rewards(rng, count):
+    return {f"奖励{n}": rng.randint(1, 50) for n in range(count)}
+
+
+@click.command("seed")
+@click.option("--users", default=1000, show_default=True, help="用户数量")
+@click.option(
+    "--tasks", default=100, show_default=True, help="每个用户的最大任务数"
+)
+@click.option(
+    "--rewards", default=20, show_default=True, help="每个用户的最大奖励数"
+)
+@click.option("--seed", default=0, show_default=True, help="随机种子")
+@click.option(
+    "--batch-size", default=5000, show_default=True, help="每批插入的行数"
+)
+@click.option(
+    "--today",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="计算任务创建日期的基准日期，默认为当天",
+)
+@click.option(
+    "--password", default="password", show_default=True, help="统一密码"
+)
+@click.option(
+    "--prefix", default="seed_", show_default=True, help="用户名前缀"
+)
+def seed_command(
+    users, tasks, rewards, seed, batch_size, today, password, prefix
+):
+    """
+    批量生成测试数据
+    - 相同的参数、随机种子和--today生成完全相同的数据
+    - 密码哈希只计算一次，所有用户共用
+    - 使用executemany按批插入，每批提交一次事务
+    - 按用户分片时用户数据写入各自的分片
+    """
+    rng = random.Random(seed)
+    today = today.date() if today else date.today()
+    password_hash = generate_password_hash(password)
+    start_id = (db.session.scalar(db.select(func.max(User.id))) or 0) + 1
+    shard_count = current_app.config["SHARD_COUNT"]
+
+    started = time_module.perf_counter()
+    for batch_start in range(0, users, batch_size):
+        batch_end = min(batch_start + batch_size, users)
+        user_rows = []
+        user_data_rows = {}  # 分片编号 -> 该分片的用户数据
+        for n in range(batch_start, batch_end):
+            user_id = start_id + n
+            shard = shard_for(user_id, shard_count)
+            user_rows.append(
+                {
+                    "id": user_id,
+                    "username": f"{prefix}{seed}_{n}",
+                    "password": password_hash,
+                    "shard": shard,
+                }
+            )
+            user_data_rows.setdefault(shard, []).append(
+                {
+                    "user_id": user_id,
+                    "point": rng.randint(0, 500),
+                    "task": make_tasks(rng, rng.randint(0, tasks), today),
+                    "reward": make_rewards(rng, rng.randint(0, rewards)),
+                    "love": "",
+                    "rest_time_to_work_ratio": 5,
+                }
+            )
+        db.session.execute(insert(User), user_rows)
+        for shard, rows in user_data_rows.items():
+            with shard_scope(shard):
+                db.session.execute(insert(UserData), rows)
+        db.session.commit()
+        click.echo(f"已插入 {batch_end}/{users} 个用户")
+
+    elapsed = time_module.perf_counter() - started
+    click.echo(f"完成，用时 {elapsed:.1f} 秒")
@@ -1,31 +1,58 @@
 import sys
 
+from engine_config import DEFAULT_ENGINE, DEFAULT_SQLITE
 from filehandle import FileHandler
 
-try:
-    file_handler = FileHandler("settings.json")
-    settings = file_handler.load()
-    DATA = settings["data"]
-    KEY = settings["key"]
-    DEVELOPMENT = settings["development"]
-    LOCAL_MODE = settings["local_mode"]
-    HITOKOTO_URL = settings["hitokoto_url"]
-    if LOCAL_MODE == "True":
-        LOCAL_MODE = True
-    else:
-        LOCAL_MODE = False
-except FileNotFoundError:
+
+def load_settings():
+    """
+    读取settings.json并转换为Flask配置项
+    - 只在create_app中调用，导入本模块不会读写文件
+    - 文件不存在时生成默认配置并退出，缺少必需的键时同样退出
+    """
     file_handler = FileHandler("settings.json")
-    settings = {
-        "data": "sqlite:///data.db",
-        "key": "key",
-        "development": "True",
-        "hitokoto_url": "https://v1.hitokoto.cn/",
-        "local_mode": "False",
-    }
-    file_handler.write_as_json(settings)
-    print("settings.json 文件已创建，请重启程序。")
-    sys.exit()
-except KeyError as e:
-    print(f"配置文件中缺少键，错误信息：{e}")
-    sys.exit()
+    try:
+        settings = file_handler.load()
+        return {
+            "SQLALCHEMY_DATABASE_URI": settings["data"],
+            "SECRET_KEY": settings["key"],
+            "DEVELOPMENT": settings["development"] == "True",
+            "LOCAL_MODE": settings["local_mode"] == "True",
+            "HITOKOTO_URL": settings["hitokoto_url"],
+            "HITOKOTO_MAX_AGE": int(settings.get("hitokoto_max_age", 60)),
+            "LEADERBOARD_SIZE": int(settings.get("leaderboard_size", 20)),
+            "LEADERBOARD_REFRESH": int(
+                settings.get("leaderboard_refresh", 60)
+            ),
+            "JOB_WORKER_THREAD": settings.get("job_worker_thread", "True")
+            == "True",
+            "TEMPLATE_CACHE": settings.get("template_cache", ""),
+            "JSON_COMPRESS_THRESHOLD": settings.get("json_compress_threshold"),
+            "SHARD_COUNT": int(settings.get("shards", 0)),
+            "SQLITE_SETTINGS": {
+                **DEFAULT_SQLITE,
+                **settings.get("sqlite", {}),
+            },
+            "ENGINE_SETTINGS": {
+                **DEFAULT_ENGINE,
+                **settings.get("engine", {}),
+            },
+        }
+    except FileNotFoundError:
+        settings = {
+            "data": "sqlite:///data.db",
+            "key": "key",
+            "development": "True",
+            "hitokoto_url": "https://v1.hitokoto.cn/",
+            "local_mode": "False",
+            "template_cache": "jinja_cache",
+            "shards": 0,
+            "sqlite": DEFAULT_SQLITE,
+            "engine": DEFAULT_ENGINE,
+        }
+        file_handler.write_as_json(settings)
+        print("settings.json 文件已创建，请重启程序。")
+        sys.exit()
+    except KeyError as e:
+        print(f"配置文件中缺少键，错误信息：{e}")
+        sys.exit()
@@ -0,0 +1,286 @@
+import contextlib
+import os
+
+import click
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import make_url
+
+from engine_config import engine_options
+from extensions import SHARD_BIND, db
+from models import User
+from schema import upgrade_schema
+
+_UNSET = object()
+
+
+def shard_uri(uri, index):
+    """
+    分片数据库的地址：与主数据库在同一目录，文件名加上_shard编号
+    内存数据库的每个分片是另一个独立的内存数据库
+    """
+    url = make_url(uri)
+    if url.database in (None, "", ":memory:"):
+        return uri
+    root, ext = os.path.splitext(url.database)
+    return url.set(database=f"{root}_shard{index}{ext}").render_as_string(
+        hide_password=False
+    )
+
+
+def shard_binds(uri, count, engine_settings):
+    """
+    生成分片数据库的SQLALCHEMY_BINDS
+    Flask-SQLAlchemy不会把SQLALCHEMY_ENGINE_OPTIONS用于binds，需要逐个传入
+    """
+    binds = {}
+    for index in range(count):
+        bind_uri = shard_uri(uri, index)
+        binds[SHARD_BIND.format(index)] = {
+            "url": bind_uri,
+            **engine_options(bind_uri, engine_settings),
+        }
+    return binds
+
+
+def shard_for(user_id, count):
+    """
+    按user_id取模选择分片，count为0（不分片）时返回None，即主数据库
+    """
+    return user_id % count if count else None
+
+
+def shard_locations():
+    """
+    所有可能存放用户数据的位置：主数据库（None）和每个分片
+    不分片时以及还没有迁移到分片的旧用户，数据都在主数据库
+    """
+    return [None, *range(current_app.config["SHARD_COUNT"])]
+
+
+def shard_engine(shard):
+    return db.engines[None if shard is None else SHARD_BIND.format(shard)]
+
+
+def sharded_tables():
+    return [t for t in db.metadata.sorted_tables if t.info.get("sharded")]
+
+
+def use_shard(user):
+    """
+    让当前Session访问user所在的分片，加载当前用户后调用
+    """
+    db.session.info["shard"] = user.shard
+
+
+@contextlib.contextmanager
+def shard_scope(shard):
+    """
+    临时切换到指定分片，用于需要遍历所有分片的查询和命令
+    """
+    info = db.session.info
+    previous = info.get("shard", _UNSET)
+    info["shard"] = shard
+    try:
+        yield
+    finally:
+        if previous is _UNSET:
+            info.pop("shard", None)
+        else:
+            info["shard"] = previous
+
+
+def assign_shard(user):
+    """
+    为新用户分配分片，在flush得到user.id之后、写入用户数据之前调用
+    """
+    user.shard = shard_for(user.id, current_app.config["SHARD_COUNT"])
+    use_shard(user)
+
+
+def init_shards():
+    """
+    在每个分片数据库中创建用户数据表，并补齐新增的列和索引
+    返回执行过的变更，便于init.py输出
+    """
+    tables = sharded_tables()
+    changes = []
+    for index in range(current_app.config["SHARD_COUNT"]):
+        engine = shard_engine(index)
+        db.metadata.create_all(engine, tables=tables)
+        changes += [
+            f"{SHARD_BIND.format(index)}.{change}"
+            for change in upgrade_schema(engine, db.metadata)
+        ]
+    return changes
+
+
+def move_user(user_id, source, target):
+    """
+    把一个用户的数据从source移动到target（None表示主数据库）
+    1. 源数据库中该用户的版本号加1，持有写锁直到移动结束，
+       期间对源数据库的写入会等待，正在修改该用户数据的请求会检测到冲突
+    2. 删除目标数据库中上次中断时可能留下的数据，复制并提交
+    3. 更新User.shard，之后的请求会访问目标数据库
+    4. 删除源数据库中的数据并提交
+    User.shard只在目标数据库的副本完整提交后才更新，因此任何位置中
+    不属于User.shard所指位置的数据都是多余的副本：
+    - 第3步之前中断：目标数据库留下副本，下次移动该用户时在第2步删除
+    - 第3步之后、第4步之前中断：源数据库留下完整的旧副本，
+      排行榜、名次和优先级老化会把该用户计算两次，
+      直到重新运行rebalance-shards，由remove_stale_rows删除
+    """
+    tables = sharded_tables()
+    user_data = db.metadata.tables["user_data"]
+    directory = (
+        update(User.__table__)
+        .where(User.__table__.c.id == user_id)
+        .values(shard=target)
+    )
+    with shard_engine(source).begin() as src:
+        src.execute(
+            update(user_data)
+            .where(user_data.c.user_id == user_id)
+            .values(version=user_data.c.version + 1)
+        )
+        rows = {}
+        for table in tables:
+            # 主键在每个数据库中各自自增，复制时不保留
+            columns = [c for c in table.columns if not c.primary_key]
+            rows[table] = (
+                src.execute(select(*columns).where(table.c.user_id == user_id))
+                .mappings()
+                .all()
+            )
+
+        with shard_engine(target).begin() as dst:
+            for table in reversed(tables):
+                dst.execute(delete(table).where(table.c.user_id == user_id))
+            for table in tables:
+                if rows[table]:
+                    dst.execute(insert(table), [dict(r) for r in rows[table]])
+            if target is None:
+                dst.execute(directory)
+
+        # 同一个SQLite文件不能同时由两个连接写入，主数据库的更新放在已有的连接中
+        if source is None:
+            src.execute(directory)
+        elif target is not None:
+            with db.engines[None].begin() as main:
+                main.execute(directory)
+
+        for table in reversed(tables):
+            src.execute(delete(table).where(table.c.user_id == user_id))
+
+
+def remove_stale_rows(shard, batch_size, user_ids=()):
+    """
+    删除位置shard中不属于该位置的用户数据（User.shard指向其他位置），
+    即move_user中断后留下的副本，返回删除的用户数
+    - 按user_data的user_id分批扫描，到主数据库中批量查询这些用户的User.shard
+    - 主数据库中已不存在的用户不处理
+    """
+    tables = sharded_tables()
+    user_data = db.metadata.tables["user_data"]
+    users = User.__table__
+    engine = shard_engine(shard)
+    last_id = 0
+    removed = 0
+    while True:
+        query = (
+            select(user_data.c.user_id)
+            .where(user_data.c.user_id > last_id)
+            .order_by(user_data.c.user_id)
+            .limit(batch_size)
+        )
+        if user_ids:
+            query = query.where(user_data.c.user_id.in_(user_ids))
+        with engine.connect() as conn:
+            ids = conn.scalars(query).all()
+        if not ids:
+            return removed
+        last_id = ids[-1]
+
+        with db.engines[None].connect() as main:
+            directory = dict(
+                main.execute(
+                    select(users.c.id, users.c.shard).where(
+                        users.c.id.in_(ids)
+                    )
+                ).all()
+            )
+        stale = [
+            user_id
+            for user_id in ids
+            if user_id in directory and directory[user_id] != shard
+        ]
+        if stale:
+            with engine.begin() as conn:
+                for table in reversed(tables):
+                    conn.execute(
+                        delete(table).where(table.c.user_id.in_(stale))
+                    )
+            removed += len(stale)
+
+
+@click.command("rebalance-shards")
+@click.option(
+    "--count",
+    type=int,
+    default=None,
+    help="目标分片数，默认为settings.json中的shards，0表示全部移回主数据库",
+)
+@click.option(
+    "--user",
+    "user_ids",
+    type=int,
+    multiple=True,
+    help="只移动指定的用户，可以重复使用",
+)
+@click.option(
+    "--batch-size", default=1000, show_default=True, help="每批读取的用户数"
+)
+def rebalance_command(count, user_ids, batch_size):
+    """
+    把用户数据移动到按user_id取模计算出的分片
+    - 增加分片：先修改settings.json中的shards并运行init.py，再运行本命令
+    - 减少或取消分片：先用--count指定新的分片数运行本命令，再修改settings.json
+    - 移动期间该用户正在进行的请求可能失败，建议在访问量低时运行
+    - 移动完成后检查每个位置，删除中断时留下的多余副本（见move_user）；
+      中断后应尽快重新运行，在此之前被中断的用户可能在两个位置各有一份数据
+    """
+    configured = current_app.config["SHARD_COUNT"]
+    count = configured if count is None else count
+    if not 0 <= count <= configured:
+        raise click.UsageError(f"--count必须在0到{configured}之间")
+
+    users = User.__table__
+    last_id = 0
+    scanned = moved = 0
+    while True:
+        query = (
+            select(users.c.id, users.c.shard)
+            .where(users.c.id > last_id)
+            .order_by(users.c.id)
+            .limit(batch_size)
+        )
+        if user_ids:
+            query = query.where(users.c.id.in_(user_ids))
+        rows = db.session.execute(query).all()
+        db.session.commit()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        for user_id, shard in rows:
+            target = shard_for(user_id, count)
+            if shard != target:
+                move_user(user_id, shard, target)
+                moved += 1
+        scanned += len(rows)
+        click.echo(f"已检查 {scanned} 个用户，移动 {moved} 个")
+
+    removed = 0
+    for shard in shard_locations():
+        removed += remove_stale_rows(shard, batch_size, user_ids)
+    click.echo(f"完成，共移动 {moved} 个用户，清理 {removed} 份多余副本")
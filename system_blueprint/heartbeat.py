@@ -1,11 +1,14 @@
 import flask_login
 from flask import Blueprint
 
+from extensions import query_budget
+
 heartbeat_blueprint = Blueprint("heartbeat_blueprint", __name__)
 
 
 @heartbeat_blueprint.route("/heartbeat")
 @flask_login.login_required
+@query_budget(1)
 def heartbeat():
     """
     心跳保活接口
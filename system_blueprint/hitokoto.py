@@ -1,8 +1,16 @@
-from flask import Blueprint, redirect, render_template, request, url_for
+from flask import (
+    Blueprint,
+    current_app,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    url_for,
+)
 from flask_login import current_user, login_required
 
-import settings
-from extensions import db, error_handler
+from extensions import db, error_handler, query_budget
+from hitokoto import get_hitokoto
 
 hitokoto_blueprint = Blueprint(
     "hitokoto_blueprint", __name__, template_folder="templates"
@@ -11,8 +19,9 @@ hitokoto_blueprint = Blueprint(
 
 @hitokoto_blueprint.route("/hitokoto")
 @login_required
+@query_budget(1)
 def hitokoto():
-    if settings.LOCAL_MODE:
+    if current_app.config["LOCAL_MODE"]:
         return render_template(
             "error.html",
             type="服务器一言设置为local模式，只支持显示存储在服务器上的诗词库",
@@ -20,8 +29,30 @@ def hitokoto():
     return render_template("hitokoto.html")
 
 
+@hitokoto_blueprint.route("/hitokoto_text")
+@login_required
+@query_budget(2)
+def hitokoto_text():
+    """
+    返回一条一言，主页加载完成后再请求，主页不必等待一言接口
+    - 按用户的一言偏好（love）获取
+    - 浏览器在HITOKOTO_MAX_AGE秒内重复刷新主页时直接使用缓存
+    - 主页请求时带上偏好作为参数，修改偏好后缓存自动失效
+    """
+    text = get_hitokoto(
+        current_app.config["HITOKOTO_URL"],
+        current_user.user_data.love,
+        current_app.config["LOCAL_MODE"],
+    )
+    response = jsonify(hitokoto=text)
+    max_age = current_app.config["HITOKOTO_MAX_AGE"]
+    response.headers["Cache-Control"] = f"private, max-age={max_age}"
+    return response
+
+
 @hitokoto_blueprint.route("/hitokoto_submit", methods=["POST"])
 @login_required
+@query_budget(4)
 @error_handler
 def hitokoto_submit():
 
@@ -1,18 +1,26 @@
 import flask_login
 from flask import Blueprint, render_template
 
-import settings
-from extensions import db
-from filehandle import FileHandler
-from hitokoto import get_hitokoto
+from extensions import db, query_budget
+from filehandle import read_cached
+from reward_and_task_blueprint.schedule import upcoming_tasks
 
 index_blueprint = Blueprint(
     "index_blueprint", __name__, template_folder="templates"
 )
 
 
+def format_interval(hours):
+    if hours == 24:
+        return "每天"
+    if hours == 24 * 7:
+        return "每周"
+    return f"每{hours}小时"
+
+
 @index_blueprint.route("/")
 @flask_login.login_required
+@query_budget(4)
 def index():
     user = flask_login.current_user
     db.session.refresh(user.user_data)
@@ -20,15 +28,20 @@ def index():
     reward = user.user_data.reward
     task = user.user_data.task
 
+    # 未到期的定期任务不显示，只统计数量和最近的到期时间
+    upcoming = upcoming_tasks(user.id)
+    not_due = {name for name, due_at in upcoming}
+
     reward_text = ""
-    file_handler = FileHandler("partials/reward_text.html")
-    add_text = file_handler.read()
+    add_text = read_cached("partials/reward_text.html")
     for name, value in reward.items():
         reward_text += add_text.format(name=name, value=value)
 
     def sort_task():
         task_name_priority = {}
         for name, value in task.items():
+            if name in not_due:
+                continue
             for n, v in value.items():
                 if n == "priority":
                     if v == "max":
@@ -46,11 +59,13 @@ def index():
 
     task_text = ""
     sort_task_name_list = sort_task()
-    file_handler = FileHandler("partials/task_text.html")
-    add_text = file_handler.read()
+    add_text = read_cached("partials/task_text.html")
     for i in sort_task_name_list:
         task_data = task.get(i)
-        if task_data["repeat"]:
+        interval_hours = task_data.get("interval_hours", 0)
+        if interval_hours:
+            repeat_icon = f"🔁{format_interval(interval_hours)}"
+        elif task_data["repeat"]:
             repeat_icon = "🔁"
         else:
             repeat_icon = "🚫"
@@ -63,13 +78,13 @@ def index():
             i=i,
         )
 
-    love = user.user_data.love
-    hitokoto = get_hitokoto(settings.HITOKOTO_URL, love, settings.LOCAL_MODE)
     return render_template(
         "index.html",
         username=user.username,
         point=point_value,
-        hitokoto=hitokoto,
+        love=user.user_data.love,
         reward=reward_text,
         task=task_text,
+        upcoming_count=len(upcoming),
+        next_due=upcoming[0] if upcoming else None,
     )
@@ -0,0 +1,134 @@
+import heapq
+import threading
+import time
+
+import flask_login
+from flask import (
+    Blueprint,
+    current_app,
+    redirect,
+    render_template,
+    request,
+    url_for,
+)
+
+from extensions import db, error_handler, query_budget
+from models import User, UserData
+from sharding import shard_locations, shard_scope
+
+leaderboard_blueprint = Blueprint(
+    "leaderboard_blueprint", __name__, template_folder="templates"
+)
+
+
+@leaderboard_blueprint.record_once
+def init_snapshot(state):
+    """
+    每个应用在进程内保存各自的排行榜快照，
+    超过LEADERBOARD_REFRESH秒后在下一次访问时刷新
+    """
+    state.app.extensions["leaderboard_snapshot"] = {
+        "taken_at": None,
+        "entries": [],
+        "lock": threading.Lock(),
+    }
+
+
+def top_entries(size):
+    """
+    查询参加排行榜的积分前size名[(用户名, 积分)]
+    - 在每个存放用户数据的位置通过(leaderboard, point)索引倒序扫描，
+      只读取前size行，合并后取前size名
+    - 用户名在主数据库中，最后一次查询取得
+    """
+    candidates = []
+    for shard in shard_locations():
+        with shard_scope(shard):
+            candidates += db.session.execute(
+                db.select(UserData.point, UserData.user_id)
+                .where(UserData.leaderboard.is_(True))
+                .order_by(UserData.point.desc())
+                .limit(size)
+            ).all()
+    top = heapq.nlargest(size, candidates)
+    names = dict(
+        db.session.execute(
+            db.select(User.id, User.username).where(
+                User.id.in_([user_id for _, user_id in top])
+            )
+        ).all()
+    )
+    return [
+        (names[user_id], point) for point, user_id in top if user_id in names
+    ]
+
+
+def get_snapshot():
+    """
+    返回排行榜快照，过期时重新查询
+    多个请求同时发现快照过期时只有一个请求查询数据库
+    """
+    refresh = current_app.config["LEADERBOARD_REFRESH"]
+    snapshot = current_app.extensions["leaderboard_snapshot"]
+    taken_at = snapshot["taken_at"]
+    if taken_at is None or time.monotonic() - taken_at > refresh:
+        with snapshot["lock"]:
+            taken_at = snapshot["taken_at"]
+            if taken_at is None or time.monotonic() - taken_at > refresh:
+                snapshot["entries"] = top_entries(
+                    current_app.config["LEADERBOARD_SIZE"]
+                )
+                snapshot["taken_at"] = time.monotonic()
+    return snapshot["entries"]
+
+
+def rank_of(point):
+    """
+    计算积分对应的名次：所有位置中参加排行榜且积分更高的人数加1
+    """
+    higher = 0
+    for shard in shard_locations():
+        with shard_scope(shard):
+            higher += db.session.scalar(
+                db.select(db.func.count())
+                .select_from(UserData)
+                .where(UserData.leaderboard.is_(True), UserData.point > point)
+            )
+    return higher + 1
+
+
+@leaderboard_blueprint.route("/leaderboard")
+@flask_login.login_required
+@query_budget(5, per_shard=2)
+@error_handler
+def leaderboard():
+    """
+    积分排行榜页面
+    - 前K名来自定期刷新的快照，不会每次访问都排序
+    - 当前用户的名次实时计算
+    """
+    user_data = flask_login.current_user.user_data
+    rank = rank_of(user_data.point) if user_data.leaderboard else None
+    return render_template(
+        "leaderboard.html",
+        entries=get_snapshot(),
+        joined=user_data.leaderboard,
+        point=user_data.point,
+        rank=rank,
+        refresh=current_app.config["LEADERBOARD_REFRESH"],
+    )
+
+
+@leaderboard_blueprint.route("/leaderboard_submit", methods=["POST"])
+@flask_login.login_required
+@query_budget(4)
+@error_handler
+def leaderboard_submit():
+    """
+    参加或退出排行榜
+    排行榜快照不会立即更新，最多等待LEADERBOARD_REFRESH秒
+    """
+    user_data = flask_login.current_user.user_data
+    user_data.leaderboard = request.form.get("leaderboard") == "True"
+    db.session.commit()
+    return redirect(url_for("leaderboard_blueprint.leaderboard"))
@@ -1,7 +1,7 @@
 import flask_login
 from flask import Blueprint, redirect, render_template, request, url_for
 
-from extensions import db, error_handler
+from extensions import InputError, db, error_handler, query_budget
 
 settings_blueprint = Blueprint(
     "settings_blueprint", __name__, template_folder="templates"
@@ -10,18 +10,20 @@ settings_blueprint = Blueprint(
 
 @settings_blueprint.route("/settings")
 @flask_login.login_required
+@query_budget(1)
 def setting():
     return render_template("settings.html")
 
 
 @settings_blueprint.route("/settings_submit", methods=["POST"])
 @flask_login.login_required
+@query_budget(4)
 @error_handler
 def settings_submit():
     ratio = request.form.get("rest_time_to_work_ratio")
     ratio = int(ratio)
     if ratio <= 0:
-        raise ValueError(info="比例必须为正整数")
+        raise InputError("比例必须为正整数")
 
     user = flask_login.current_user
     db.session.refresh(user.user_data)
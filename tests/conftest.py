@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import models
+from app import create_app, init_db
+from point_and_timer_blueprint import timer_events
+
+ACCOUNT = {"username": "u", "password": "secret"}
+
+
+def make_config(path, shards=0):
+    """
+    使用path处临时数据库的测试配置
+    """
+    return {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+        "SECRET_KEY": "test",
+        "LOCAL_MODE": True,
+        "TESTING": True,
+        "WTF_CSRF_ENABLED": False,
+        "SHARD_COUNT": shards,
+        # 后台任务由测试调用jobs.work执行，不在请求中启动线程
+        "JOB_WORKER_THREAD": False,
+    }
+
+
+def make_app(path, shards=0):
+    """
+    创建测试应用并初始化数据库
+    """
+    app = create_app(make_config(path, shards))
+    with app.app_context():
+        init_db()
+    return app
+
+
+def log_in(client, account=ACCOUNT):
+    """
+    注册并登录account
+    """
+    client.post("/register_submit", data=account)
+    client.post("/login_submit", data=account)
+    return client
+
+
+@pytest.fixture(params=[0, 2], ids=["unsharded", "sharded"])
+def app(request, tmp_path):
+    """
+    分别在不分片和两个分片的配置下运行的测试应用
+    """
+    return make_app(tmp_path / "data.db", request.param)
+
+
+@pytest.fixture
+def client(app):
+    """
+    已注册并登录用户u的测试客户端
+    """
+    return log_in(app.test_client())
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    替换计时器使用的datetime，调用clock(秒数)让当前时间前进
+    """
+
+    class Clock(datetime):
+        offset = timedelta()
+
+        @classmethod
+        def now(cls, tz=None):
+            return super().now(tz) + cls.offset
+
+    monkeypatch.setattr(models, "datetime", Clock)
+    monkeypatch.setattr(timer_events, "datetime", Clock)
+
+    def advance(seconds):
+        Clock.offset += timedelta(seconds=seconds)
+
+    return advance
@@ -0,0 +1,52 @@
+"""
+CompactJSON的编码、压缩阈值和旧数据兼容
+"""
+
+import json
+
+from compact_json import COMPRESSED, PLAIN, LazyJSON, decode, encode
+from extensions import db
+from models import UserData
+from sharding import shard_scope
+
+TASKS = {
+    f"任务{i}": {"points": i, "time": 0, "priority": 5, "repeat": False}
+    for i in range(1, 200)
+}
+
+
+def stored_task(user_id):
+    raw = db.session.execute(
+        db.text("SELECT task FROM user_data WHERE user_id = :id"),
+        {"id": user_id},
+    ).scalar()
+    return bytes(raw)
+
+
+def test_encode_round_trip():
+    assert decode(encode(TASKS)) == TASKS
+    assert encode(TASKS)[:1] == PLAIN
+    assert encode(TASKS, compress_threshold=100)[:1] == COMPRESSED
+    assert decode(encode(TASKS, compress_threshold=100)) == TASKS
+
+
+def test_legacy_json_text():
+    text = json.dumps(TASKS, ensure_ascii=False)
+    assert decode(text) == TASKS
+    assert decode(text.encode()) == TASKS
+    assert LazyJSON(text) == TASKS
+
+
+def test_compress_threshold_setting(app):
+    with app.app_context(), shard_scope(None):
+        user_data = UserData(user_id=1, task=TASKS, reward={})
+        db.session.add(user_data)
+        db.session.commit()
+        assert stored_task(1)[:1] == PLAIN
+
+        app.config["JSON_COMPRESS_THRESHOLD"] = 1024
+        user_data.task = {**user_data.task, "新任务": TASKS["任务1"]}
+        db.session.commit()
+        assert stored_task(1)[:1] == COMPRESSED
+        db.session.expire_all()
+        assert user_data.task == {**TASKS, "新任务": TASKS["任务1"]}
@@ -0,0 +1,118 @@
+"""
+并发修改测试：多个进程同时修改同一个用户的数据，检查是否有修改丢失
+UserData带有乐观锁版本号，版本冲突的请求由commit_with_retry基于最新数据重试，
+因此最终结果应当等于所有进程提交的总和
+"""
+
+import multiprocessing
+
+import pytest
+from conftest import ACCOUNT, log_in, make_app, make_config
+
+from app import create_app
+from extensions import db
+from models import User
+from sharding import use_shard
+
+PROCESSES = 4
+WRITES = 15
+
+TASK = {"points": 1, "time": 10, "importance": "3", "value": 1, "urgent": 1}
+
+
+def add_items(client, worker_id, n):
+    """
+    交替添加任务和奖励，返回是否成功
+    """
+    name = f"w{worker_id}-{n}"
+    if n % 2:
+        response = client.post(
+            "/reward/add_submit", data={"name": name, "points": 1}
+        )
+    else:
+        response = client.post(
+            "/task/add_submit",
+            data={**TASK, "name": name, "repeat": "False"},
+        )
+    return response.status_code == 302
+
+
+def complete_task(client, worker_id, n):
+    """
+    完成一个不需要计时的定期任务获得1积分，返回是否成功
+    """
+    response = client.post(
+        "/point",
+        data={
+            "point_change": 1,
+            "name": f"w{worker_id}-{n}",
+            "repeat": "True",
+            "time": 0,
+        },
+    )
+    return "成功" in response.text
+
+
+def worker(config, action, worker_id, start, results):
+    try:
+        client = create_app(config).test_client()
+        client.post("/login_submit", data=ACCOUNT)
+        start.wait()
+        failed = 0
+        for n in range(WRITES):
+            if not action(client, worker_id, n):
+                failed += 1
+        results.put(failed)
+    except BaseException:
+        results.put(None)
+        raise
+
+
+def run_workers(config, action):
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    results = context.Queue()
+    workers = [
+        context.Process(
+            target=worker, args=(config, action, i, start, results)
+        )
+        for i in range(PROCESSES)
+    ]
+    for p in workers:
+        p.start()
+    start.set()
+    counts = [results.get(timeout=120) for _ in workers]
+    for p in workers:
+        p.join()
+    assert None not in counts, "写入进程出错"
+    return sum(counts)
+
+
+def load_user_data(app):
+    with app.app_context():
+        user = db.session.execute(
+            db.select(User).filter_by(username=ACCOUNT["username"])
+        ).scalar_one()
+        use_shard(user)
+        user_data = user.user_data
+        return user_data.point, dict(user_data.task), dict(user_data.reward)
+
+
+@pytest.fixture(params=[0, 2], ids=["unsharded", "sharded"])
+def config(request, tmp_path):
+    path = tmp_path / "data.db"
+    log_in(make_app(path, request.param).test_client())
+    # 版本冲突重试会重复执行语句，不检查query_budget
+    return {**make_config(path, request.param), "TESTING": False}
+
+
+def test_concurrent_adds_are_kept(config):
+    assert run_workers(config, add_items) == 0
+    _, task, reward = load_user_data(create_app(config))
+    assert len(task) + len(reward) == PROCESSES * WRITES
+
+
+def test_concurrent_points_are_kept(config):
+    assert run_workers(config, complete_task) == 0
+    point, _, _ = load_user_data(create_app(config))
+    assert point == PROCESSES * WRITES
@@ -0,0 +1,54 @@
+"""
+导入数据的校验：格式错误的记录显示带行号的提示，不进入通用错误页
+"""
+
+import io
+import json
+
+import pytest
+
+
+def import_lines(client, *records):
+    text = "\n".join(json.dumps(r, ensure_ascii=False) for r in records)
+    return client.post(
+        "/import_submit",
+        data={"file": (io.BytesIO(text.encode()), "data.ndjson")},
+    )
+
+
+@pytest.mark.parametrize(
+    "record",
+    [
+        {"type": "reward", "name": "x"},
+        {"type": "reward", "name": "x", "points": None},
+        {"type": "reward", "name": "x", "points": "many"},
+        {"type": "task", "name": "x", "time": 0},
+        {"type": "task", "name": "x", "points": 1, "time": None},
+        {"type": "task", "name": "x", "points": 1, "importance": "3"},
+        {"type": "task", "name": "x", "points": 1, "interval_hours": None},
+        {"type": "point"},
+        {"type": "point", "point": "x"},
+    ],
+)
+def test_invalid_field_reports_line(client, record):
+    response = import_lines(client, {"type": "point", "point": 1}, record)
+    page = response.get_data(as_text=True)
+    assert "第2行" in page
+    assert "未知错误" not in page
+
+
+def test_rule_error_reports_line(client):
+    response = import_lines(client, {"type": "point", "point": -1})
+    assert "第1行：积分不能为负数" in response.get_data(as_text=True)
+
+
+def test_valid_records_are_imported(client):
+    response = import_lines(
+        client,
+        {"type": "point", "point": 10},
+        {"type": "reward", "name": "奖励", "points": 2},
+        {"type": "task", "name": "任务", "points": 3, "priority": 7},
+    )
+    assert response.status_code == 302
+    page = client.get("/").get_data(as_text=True)
+    assert "奖励" in page and "任务" in page
@@ -0,0 +1,48 @@
+"""
+后台任务队列：注销账户的任务由worker执行，worker遇到数据库错误时不退出
+"""
+
+from conftest import ACCOUNT, make_config
+from sqlalchemy.exc import OperationalError
+
+import jobs
+from app import create_app
+from extensions import db
+from models import User
+
+
+def test_worker_thread_is_on_by_default(tmp_path):
+    config = make_config(tmp_path / "data.db")
+    del config["JOB_WORKER_THREAD"]
+    assert create_app(config).config["JOB_WORKER_THREAD"] is True
+
+
+def test_delete_account_runs_in_worker(app, client):
+    client.post("/delete_account_submit")
+    with app.app_context():
+        assert db.session.execute(
+            db.select(User).filter_by(username=ACCOUNT["username"])
+        ).scalar_one_or_none()
+    jobs.work(app, poll_interval=0, burst=True)
+    with app.app_context():
+        assert not db.session.execute(
+            db.select(User).filter_by(username=ACCOUNT["username"])
+        ).scalar_one_or_none()
+
+
+def test_worker_survives_database_errors(app, client, monkeypatch, capsys):
+    client.post("/delete_account_submit")
+    claim_job = jobs.claim_job
+    calls = []
+
+    def locked_once():
+        calls.append(None)
+        if len(calls) == 1:
+            raise OperationalError("UPDATE job", {}, "database is locked")
+        return claim_job()
+
+    monkeypatch.setattr(jobs, "claim_job", locked_once)
+    jobs.work(app, poll_interval=0, burst=True)
+    assert "database is locked" in capsys.readouterr().out
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count(User.id))) == 0
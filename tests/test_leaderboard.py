@@ -0,0 +1,21 @@
+"""
+排行榜快照按应用保存，同一进程中的多个应用互不影响
+"""
+
+from conftest import log_in, make_app
+
+
+def test_snapshot_is_per_app(tmp_path):
+    clients = []
+    for name in ("a", "b"):
+        app = make_app(tmp_path / f"{name}.db")
+        app.config["LEADERBOARD_REFRESH"] = 3600
+        client = log_in(
+            app.test_client(), {"username": name, "password": "secret"}
+        )
+        client.post("/leaderboard_submit", data={"leaderboard": "True"})
+        clients.append(client)
+
+    for name, client in zip(("a", "b"), clients):
+        page = client.get("/leaderboard").get_data(as_text=True)
+        assert f"<td>{name}</td>" in page
@@ -0,0 +1,205 @@
+"""
+SQL语句预算测试：在测试模式下请求每个路由，超出query_budget声明的预算
+或没有声明预算却访问了数据库时，after_request钩子抛出QueryBudgetExceeded
+分别在不分片和两个分片的配置下运行
+"""
+
+import io
+import json
+
+import flask_login
+import pytest
+from conftest import log_in
+
+from extensions import QueryBudgetExceeded
+
+TASK = {"points": 5, "time": 10, "importance": "3", "value": 1, "urgent": 1}
+IMPORT_FILE = "\n".join(
+    json.dumps(record, ensure_ascii=False)
+    for record in (
+        {"type": "point", "point": 10},
+        {"type": "reward", "name": "导入奖励", "points": 2},
+        {
+            "type": "task",
+            "name": "导入任务",
+            "points": 3,
+            "time": 0,
+            "priority": 7,
+            "repeat": True,
+            "interval_hours": 24,
+            "created": "2026-01-01",
+        },
+    )
+)
+
+# (方法, 路径, 表单, 准备步骤)，准备步骤先执行，不计入被测路由的语句；
+# 步骤为数字时让计时器的时钟前进这么多秒
+ROUTES = [
+    ("GET", "/", None, []),
+    ("GET", "/login", None, []),
+    ("POST", "/login_submit", {"username": "u", "password": "secret"}, []),
+    ("GET", "/register", None, []),
+    (
+        "POST",
+        "/register_submit",
+        {"username": "new", "password": "secret"},
+        [],
+    ),
+    ("GET", "/logout", None, []),
+    ("GET", "/delete_account", None, []),
+    ("POST", "/delete_account_submit", {}, []),
+    ("GET", "/LICENSE", None, []),
+    ("GET", "/LICENSES", None, []),
+    ("GET", "/LICENSES_NOT_SOFTWARE", None, []),
+    ("GET", "/about", None, []),
+    ("GET", "/settings", None, []),
+    ("POST", "/settings_submit", {"rest_time_to_work_ratio": 4}, []),
+    ("GET", "/hitokoto", None, []),
+    ("GET", "/hitokoto_text", None, []),
+    ("POST", "/hitokoto_submit", {"a": "on"}, []),
+    ("GET", "/leaderboard", None, [("POST", "/leaderboard_submit")]),
+    ("POST", "/leaderboard_submit", {"leaderboard": "True"}, []),
+    ("GET", "/heartbeat", None, []),
+    (
+        "POST",
+        "/point",
+        {"point_change": -1, "name": "奖励", "repeat": "True"},
+        [],
+    ),
+    ("POST", "/point", {"point_change": 5, "name": "任务"}, []),
+    (
+        "POST",
+        "/point",
+        {"point_change": 5, "name": "定期任务", "repeat": "True"},
+        [],
+    ),
+    (
+        "POST",
+        "/point",
+        {"point_change": 5, "name": "任务", "from": "timer"},
+        [("POST", "/timer_event", {"action": "start", "name": "任务"}), 600],
+    ),
+    (
+        "POST",
+        "/timer_submit",
+        {"name": "任务", "value": 5, "repeat": "False"},
+        [],
+    ),
+    ("GET", "/timer_stream", None, []),
+    (
+        "POST",
+        "/timer_event",
+        {"action": "start", "name": "任务"},
+        [],
+    ),
+    ("GET", "/reward/add", None, []),
+    ("POST", "/reward/add_submit", {"name": "新奖励", "points": 3}, []),
+    ("GET", "/reward/remove", None, []),
+    ("POST", "/reward/remove_submit", {"奖励": "on"}, []),
+    ("GET", "/export", None, []),
+    ("GET", "/import", None, []),
+    ("POST", "/import_submit", "file", []),
+    ("GET", "/task/add", None, []),
+    (
+        "POST",
+        "/task/add_submit",
+        {**TASK, "name": "新任务", "repeat": "False"},
+        [],
+    ),
+    (
+        "POST",
+        "/task/add_submit",
+        {**TASK, "name": "定期任务", "repeat": "True", "recurrence": "weekly"},
+        [],
+    ),
+    (
+        "POST",
+        "/task/add_submit",
+        {**TASK, "name": "定期任务", "repeat": "False"},
+        [],
+    ),
+    ("GET", "/task/remove", None, []),
+    ("POST", "/task/remove_submit", {"任务": "on", "定期任务": "on"}, []),
+]
+
+# 这些路由在测试配置下正常返回错误提示页
+ERROR_PAGES = {"/hitokoto"}
+
+
+def add_items(client):
+    """
+    添加一个需要计时10分钟的普通任务、一个不需要计时的定期任务和一个奖励
+    """
+    client.post("/task/add_submit", data={**TASK, "name": "任务"})
+    client.post(
+        "/task/add_submit",
+        data={
+            **TASK,
+            "name": "定期任务",
+            "time": 0,
+            "repeat": "True",
+            "recurrence": "daily",
+        },
+    )
+    client.post("/reward/add_submit", data={"name": "奖励", "points": 1})
+
+
+@pytest.fixture
+def client(client):
+    add_items(client)
+    return client
+
+
+def send(client, method, path, data=None):
+    if data == "file":
+        data = {"file": (io.BytesIO(IMPORT_FILE.encode()), "data.ndjson")}
+    return client.open(path, method=method, data=data)
+
+
+@pytest.mark.parametrize(
+    "method, path, data, setup",
+    ROUTES,
+    ids=[f"{method} {path}" for method, path, _, _ in ROUTES],
+)
+def test_route_within_budget(client, clock, method, path, data, setup):
+    for step in setup:
+        if isinstance(step, int):
+            clock(step)
+        else:
+            send(client, *step)
+    response = send(client, method, path, data)
+    assert response.status_code < 400
+    # 事件流不会结束，只检查HTML页面
+    if response.mimetype == "text/html" and path not in ERROR_PAGES:
+        assert "错误提示" not in response.get_data(as_text=True)
+    response.close()
+
+
+def test_every_route_is_covered(app):
+    tested = {path for _, path, _, _ in ROUTES}
+    routes = {
+        rule.rule
+        for rule in app.url_map.iter_rules()
+        if rule.endpoint != "static"
+    }
+    assert routes == tested
+
+
+def test_exceeding_budget_raises(client, monkeypatch):
+    index = client.application.view_functions["index_blueprint.index"]
+    monkeypatch.setattr(index, "query_budget", 1)
+    with pytest.raises(QueryBudgetExceeded, match="超出预算1条"):
+        client.get("/")
+
+
+def test_route_without_budget_raises(app):
+    @app.route("/no_budget")
+    @flask_login.login_required
+    def no_budget():
+        return str(flask_login.current_user.id)
+
+    client = log_in(app.test_client())
+    with pytest.raises(
+        QueryBudgetExceeded, match="没有用query_budget声明预算"
+    ):
+        client.get("/no_budget")
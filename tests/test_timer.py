@@ -0,0 +1,102 @@
+"""
+计时任务的积分只有在服务端确认计时完成后才发放
+工作时长和是否需要计时都以保存的任务为准，不信任表单中的time和from
+"""
+
+import json
+
+import pytest
+from conftest import log_in
+
+from app import create_app
+from point_and_timer_blueprint import timer_events
+
+TASK = {"points": 5, "importance": "3", "value": 1, "urgent": 1}
+
+
+@pytest.fixture
+def client(client):
+    client.post("/task/add_submit", data={**TASK, "name": "计时", "time": 10})
+    client.post("/task/add_submit", data={**TASK, "name": "即时", "time": 0})
+    return client
+
+
+def current_point(client):
+    first_line = client.get("/export").get_data(as_text=True).split("\n")[0]
+    return json.loads(first_line)["point"]
+
+
+def complete(client, name, **form):
+    data = {"point_change": 5, "name": name, **form}
+    return client.post("/point", data=data).get_data(as_text=True)
+
+
+def test_timer_uses_stored_duration(client):
+    state = client.post(
+        "/timer_event", data={"action": "start", "name": "计时", "time": 0}
+    ).get_json()
+    assert state["remaining"] > 10 * 60 - 5
+
+
+def test_unfinished_timer_gets_no_points(client, clock):
+    client.post(
+        "/timer_event", data={"action": "start", "name": "计时", "time": 0}
+    )
+    clock(60)
+    page = complete(client, "计时", time=0, **{"from": "timer"})
+    assert "计时尚未完成" in page
+    assert current_point(client) == 0
+
+
+def test_timed_task_without_timer_shows_timer(client):
+    page = complete(client, "计时", time=0)
+    assert 'id="timer-form"' in page
+    assert current_point(client) == 0
+
+
+def test_finished_timer_gets_points(client, clock):
+    client.post("/timer_event", data={"action": "start", "name": "计时"})
+    clock(10 * 60)
+    form = {"from": "timer", "repeat": "True"}
+    assert "成功" in complete(client, "计时", **form)
+    assert current_point(client) == 5
+    # 重复的任务保留，但同一次计时不能再次领取积分
+    assert "计时尚未完成" in complete(client, "计时", **form)
+    assert current_point(client) == 5
+
+
+def test_untimed_task_gets_points_directly(client):
+    assert "成功" in complete(client, "即时")
+    assert current_point(client) == 5
+
+
+def read_event(response):
+    return json.loads(next(response.response).decode().removeprefix("data: "))
+
+
+def test_stream_receives_changes_from_other_processes(
+    app, client, monkeypatch
+):
+    # 使用同一数据库的另一个应用相当于另一个gunicorn worker，不共享TimerHub
+    other = log_in(create_app(app.config).test_client())
+    monkeypatch.setattr(timer_events, "POLL_INTERVAL", 0.05)
+    response = client.get("/timer_stream", buffered=False)
+    assert read_event(response) is None
+
+    other.post("/timer_event", data={"action": "start", "name": "计时"})
+    state = read_event(response)
+    assert state["name"] == "计时"
+    assert state["status"] == "running"
+
+    other.post("/timer_event", data={"action": "pause", "name": "计时"})
+    assert read_event(response)["status"] == "paused"
+    response.close()
+
+
+def test_stream_receives_changes_from_same_process(client, monkeypatch):
+    monkeypatch.setattr(timer_events, "POLL_INTERVAL", 60)
+    response = client.get("/timer_stream", buffered=False)
+    read_event(response)
+    client.post("/timer_event", data={"action": "start", "name": "计时"})
+    assert read_event(response)["name"] == "计时"
+    response.close()